@@ -6,6 +6,7 @@ import httpx
 import time
 
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from services.container import get_container, supabase_client
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -40,7 +41,7 @@ async def get_audit_logs(
     try:
         offset = (page - 1) * page_size
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             params = {
                 "select": "id,student_id,course_id,message_role,content,was_flagged,flag_reason,created_at",
                 "order": "created_at.desc",
@@ -109,10 +110,11 @@ async def system_health():
     # Check Supabase connectivity
     supabase_status = "healthy"
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
+        async with supabase_client() as client:
             res = await client.get(
                 f"{SUPABASE_URL}/rest/v1/profiles?select=id&limit=1",
                 headers=_headers(),
+                timeout=5.0,
             )
             if res.status_code != 200:
                 supabase_status = "degraded"
@@ -129,6 +131,7 @@ async def system_health():
             "latency_p50_ms": round(p50 * 1000, 1),
             "latency_p95_ms": round(p95 * 1000, 1),
         },
+        "service_metrics": get_container().metrics(),
         "services": {
             "fastapi": "healthy",
             "supabase": supabase_status,
@@ -137,6 +140,36 @@ async def system_health():
     }
 
 
+class InvalidateSubjectRequest(BaseModel):
+    subject_id: str
+
+
+@router.post("/invalidate-subject")
+async def invalidate_subject(request: InvalidateSubjectRequest):
+    """
+    Drop everything this server derived from a subject's knowledge_base rows:
+    cached answers, the local vector index, near-duplicate signatures and
+    question banks; the document catalog re-syncs in the background.
+    For writes made outside the API (scripts/bulk_upload.py calls this when done).
+    """
+    container = get_container()
+    subject_id = request.subject_id
+    container.local_index.invalidate(subject_id)
+    if container.near_duplicates is not None:
+        container.near_duplicates.invalidate(subject_id)
+    container.document_catalog.refresh_in_background(subject_id)
+    cached_answers = container.rag_service.response_cache.invalidate_subject(subject_id)
+    bank_topics = 0
+    if container.question_bank is not None:
+        bank_topics = container.question_bank.invalidate_subject(subject_id)
+    return {
+        "status": "invalidated",
+        "subject_id": subject_id,
+        "cached_answers_removed": cached_answers,
+        "bank_topics_removed": bank_topics,
+    }
+
+
 class UserUpdateRequest(BaseModel):
     is_approved: Optional[bool] = None
     role: Optional[str] = None
@@ -159,7 +192,7 @@ async def update_user(user_id: str, request: UserUpdateRequest):
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             res = await client.patch(
                 f"{SUPABASE_URL}/rest/v1/profiles",
                 headers=_headers(),
@@ -201,7 +234,7 @@ async def list_users(
         if role:
             params["role"] = f"eq.{role}"
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             res = await client.get(
                 f"{SUPABASE_URL}/rest/v1/profiles",
                 headers=_headers(),
@@ -236,7 +269,7 @@ async def create_user(request: CreateUserRequest):
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters.")
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             # Step 1: Create auth user via Supabase GoTrue signup
             signup_res = await client.post(
                 f"{SUPABASE_URL}/auth/v1/signup",
@@ -298,7 +331,7 @@ class ResetPasswordRequest(BaseModel):
 async def reset_password(request: ResetPasswordRequest):
     """Send a password reset email via Supabase Auth."""
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             res = await client.post(
                 f"{SUPABASE_URL}/auth/v1/recover",
                 headers={
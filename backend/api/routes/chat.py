@@ -1,9 +1,11 @@
 """Chat API Routes — RAG + Socratic Engine."""
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+import json
 
-from services.rag_service import RAGService
+from services.container import get_container
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
@@ -22,6 +24,9 @@ class ChatResponse(BaseModel):
     confidence: str = "medium"
     intent: str = ""
     strategy: str = ""
+    retrieval_legs: Dict = {}
+    cached: bool = False
+    context_tokens: int = 0
 
 
 @router.post("/query", response_model=ChatResponse)
@@ -34,8 +39,8 @@ async def chat_query(request: ChatRequest):
         raise HTTPException(status_code=400, detail="Subject ID is required")
 
     try:
-        rag_service = RAGService()
-        result = rag_service.query(
+        rag_service = get_container().rag_service
+        result = await rag_service.aquery(
             query=request.query,
             subject_id=request.subject_id,
             conversation_history=request.conversation_history,
@@ -46,17 +51,54 @@ async def chat_query(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream a Socratic response as Server-Sent Events.
+
+    Events: ``metadata`` (sources, intent, strategy) first, then ``token``
+    events with response text, then ``done`` (or ``error``).
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    if not request.subject_id.strip():
+        raise HTTPException(status_code=400, detail="Subject ID is required")
+
+    rag_service = get_container().rag_service
+
+    async def event_stream():
+        try:
+            async for event in rag_service.astream(
+                query=request.query,
+                subject_id=request.subject_id,
+                conversation_history=request.conversation_history,
+                mastery_score=request.mastery_score or 0.5,
+            ):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            error = {"message": f"Chat processing failed: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/retrieve")
 async def retrieve_context(request: ChatRequest):
     """Retrieve relevant context without generating a response (for debugging/inspection)."""
     try:
-        rag_service = RAGService()
-        docs = rag_service.retrieve(request.query, request.subject_id)
+        rag_service = get_container().rag_service
+        retrieval = await rag_service.aretrieve(request.query, request.subject_id)
+        docs = retrieval["results"]
         return {
             "query": request.query,
             "subject_id": request.subject_id,
             "results": docs,
             "count": len(docs),
+            "legs": retrieval["legs"],
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,11 @@
 """Document Upload API Routes."""
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-import httpx
-from services.document_processor import DocumentProcessor
-from services.embedding_service import EmbeddingService
-from services.vector_store import VectorStore
-from config.rag_config import RAG_SETTINGS
+import asyncio
+
+from services.container import get_container, supabase_client
+from services.ingestion import INGEST_MODES
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from config.rag_config import DOCUMENT_CATALOG_CONFIG
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
@@ -15,94 +15,71 @@ def _headers():
         "apikey": SUPABASE_ANON_KEY,
         "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
         "Content-Type": "application/json",
-        "Prefer": "return=representation",
+        # Count only: return=representation would echo every row and its embedding
+        "Prefer": "return=minimal, count=exact",
     }
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     subject_id: str = Form(...),
+    mode: str = Form("append"),
 ):
-    """Upload a PDF, extract text, chunk, embed, and store in knowledge_base."""
+    """Queue a PDF for background extraction, chunking, embedding and storage.
+
+    ``mode="upsert"`` replaces an existing document of the same name by chunk
+    diff (only changed chunks are embedded and written). Returns a job id at
+    once; poll ``GET /api/documents/jobs/{job_id}``.
+    """
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    if mode not in INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(INGEST_MODES)}")
 
-    try:
-        # Read file bytes
-        pdf_bytes = await file.read()
-
-        # 1. Extract text
-        processor = DocumentProcessor(
-            chunk_size=RAG_SETTINGS["chunk_size"],
-            chunk_overlap=RAG_SETTINGS["chunk_overlap"],
-        )
-        extracted = processor.extract_text_from_bytes(pdf_bytes, file.filename)
-
-        if not extracted["text"] or len(extracted["text"]) < 50:
-            raise HTTPException(status_code=422, detail="Could not extract meaningful text from the PDF")
-
-        # 2. Chunk
-        chunks = processor.chunk_text(extracted["text"], extracted["metadata"])
-
-        if not chunks:
-            raise HTTPException(status_code=422, detail="No chunks generated from the document")
-
-        # 3. Generate embeddings
-        embedding_service = EmbeddingService()
-        chunk_texts = [c["text"] for c in chunks]
-        embeddings = embedding_service.generate_embeddings_batch(chunk_texts)
-
-        # 4. Store in vector DB
-        vector_store = VectorStore()
-        stored = vector_store.store_chunks_with_embeddings(
-            chunks=chunks,
-            embeddings=embeddings,
-            subject_id=subject_id,
-            source_document=file.filename,
-        )
+    pdf_bytes = await file.read()
+    if not pdf_bytes:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
-        return {
-            "status": "success",
-            "filename": file.filename,
-            "chunks_processed": len(chunks),
-            "pages": extracted["metadata"].get("total_pages", 0),
-            "stored_records": len(stored) if stored else 0,
-        }
-    except HTTPException:
-        raise
+    try:
+        job_id = get_container().ingestion_jobs.submit(subject_id, file.filename, pdf_bytes, mode)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Could not queue document: {str(e)}")
 
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "filename": file.filename,
+        "mode": mode,
+    }
 
-@router.get("/stats/{subject_id}")
-async def get_document_stats(subject_id: str):
-    """Get document statistics for a subject via REST API."""
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            res = await client.get(
-                f"{SUPABASE_URL}/rest/v1/knowledge_base",
-                headers=_headers(),
-                params={
-                    "select": "id,source_document,created_at",
-                    "course_id": f"eq.{subject_id}",
-                },
-            )
-            res.raise_for_status()
-            data = res.json()
 
-        docs = {}
-        for row in data:
-            src = row.get("source_document", "Unknown")
-            if src not in docs:
-                docs[src] = {"document": src, "chunks": 0, "uploaded_at": row.get("created_at")}
-            docs[src]["chunks"] += 1
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Report an ingestion job's stage, progress and chunk counters."""
+    job = get_container().ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-        return {
-            "subject_id": subject_id,
-            "total_chunks": len(data),
-            "documents": list(docs.values()),
-        }
+
+@router.get("/stats/{subject_id}")
+async def get_document_stats(
+    subject_id: str,
+    limit: int = DOCUMENT_CATALOG_CONFIG["default_limit"],
+    offset: int = 0,
+    refresh: bool = False,
+):
+    """Per-document chunk counts for a subject, one page at a time.
+
+    Served from the document catalog (kept current by uploads and deletes);
+    ``refresh=true`` rebuilds it from knowledge_base first.
+    """
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be >= 1 and offset >= 0")
+    limit = min(limit, DOCUMENT_CATALOG_CONFIG["max_limit"])
+    try:
+        return await get_container().document_catalog.aget_page(subject_id, limit, offset, refresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -114,7 +91,16 @@ async def delete_document(document_name: str, subject_id: str):
     Matched by source_document name + course_id.
     """
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        container = get_container()
+        removed_terms = set()
+        if container.question_bank is not None:
+            # The removed text decides which topic banks go stale
+            for row in await asyncio.to_thread(
+                container.vector_store.fetch_document_chunks, subject_id, document_name
+            ):
+                removed_terms.update(container.question_bank.terms(row.get("content") or ""))
+
+        async with supabase_client() as client:
             res = await client.delete(
                 f"{SUPABASE_URL}/rest/v1/knowledge_base",
                 headers=_headers(),
@@ -124,12 +110,22 @@ async def delete_document(document_name: str, subject_id: str):
                 },
             )
             res.raise_for_status()
-            deleted = res.json()
+            # Content-Range: "*/<deleted>"
+            content_range = res.headers.get("content-range", "")
+            total = content_range.split("/")[-1] if "/" in content_range else ""
+            deleted = int(total) if total.isdigit() else 0
+        container.local_index.remove_document(subject_id, document_name)
+        if container.near_duplicates is not None:
+            container.near_duplicates.invalidate(subject_id)
+        container.document_catalog.remove_document(subject_id, document_name)
+        container.rag_service.response_cache.invalidate_subject(subject_id)
+        if container.question_bank is not None:
+            container.question_bank.invalidate_topics(subject_id, removed_terms)
 
         return {
             "status": "deleted",
             "document": document_name,
-            "chunks_removed": len(deleted) if deleted else 0,
+            "chunks_removed": deleted,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,11 +2,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
-import httpx
 import json
 
-from services.quiz_generator import QuizGenerator
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from config.rag_config import QUESTION_BANK_CONFIG
+from services.container import get_container, supabase_client
 
 router = APIRouter(prefix="/api/quiz", tags=["quiz"])
 
@@ -30,6 +30,12 @@ class QuizCreateRequest(BaseModel):
     question_count: Optional[int] = 10
 
 
+class QuestionBankPrefillRequest(BaseModel):
+    topic: str
+    subject_id: str
+    difficulties: Optional[List[str]] = None
+
+
 class QuizPublishRequest(BaseModel):
     quiz_id: str
 
@@ -55,13 +61,23 @@ async def create_quiz(request: QuizCreateRequest):
         raise HTTPException(status_code=400, detail="Topic is required")
 
     try:
-        generator = QuizGenerator()
-        quiz_data = generator.generate_quiz(
-            topic=request.topic,
-            subject_id=request.subject_id,
-            mastery_score=0.5,
-            question_count=request.question_count or 10,
-        )
+        container = get_container()
+        generator = container.quiz_generator
+        if container.question_bank is not None:
+            # Sample pre-generated questions; a cold topic is generated once and banked
+            quiz_data = await container.question_bank.adraw(
+                subject_id=request.subject_id,
+                topic=request.topic,
+                difficulty=generator.calculate_difficulty(0.5),
+                count=request.question_count or 10,
+            )
+        else:
+            quiz_data = await generator.agenerate_quiz(
+                topic=request.topic,
+                subject_id=request.subject_id,
+                mastery_score=0.5,
+                question_count=request.question_count or 10,
+            )
 
         if "error" in quiz_data and not quiz_data.get("questions"):
             raise HTTPException(status_code=422, detail=quiz_data["error"])
@@ -69,7 +85,7 @@ async def create_quiz(request: QuizCreateRequest):
         title = request.title or f"Quiz: {request.topic}"
 
         # Save to Supabase
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             resp = await client.post(
                 f"{SUPABASE_URL}/rest/v1/quizzes",
                 headers=_headers(),
@@ -96,11 +112,38 @@ async def create_quiz(request: QuizCreateRequest):
         raise HTTPException(status_code=500, detail=f"Quiz creation failed: {str(e)}")
 
 
+@router.post("/bank/prefill")
+async def prefill_question_bank(request: QuestionBankPrefillRequest):
+    """Faculty: generate questions for a topic ahead of time so quiz creation is instant."""
+    if not request.topic.strip():
+        raise HTTPException(status_code=400, detail="Topic is required")
+    bank = get_container().question_bank
+    if bank is None:
+        raise HTTPException(status_code=503, detail="Question bank is disabled")
+
+    difficulties = request.difficulties or QUESTION_BANK_CONFIG["prefill_difficulties"]
+    invalid = [d for d in difficulties if d not in ("beginner", "intermediate", "advanced")]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown difficulty: {', '.join(invalid)}")
+
+    scheduled = [
+        d for d in difficulties
+        if await bank.arefill_in_background(request.subject_id, request.topic, d)
+    ]
+    return {
+        "scheduled": scheduled,
+        "available": {
+            d: await bank.aavailable(bank.make_key(request.subject_id, request.topic, d))
+            for d in difficulties
+        },
+    }
+
+
 @router.post("/publish")
 async def publish_quiz(request: QuizPublishRequest):
     """Mark a quiz as published so students can see it."""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.patch(
                 f"{SUPABASE_URL}/rest/v1/quizzes?id=eq.{request.quiz_id}",
                 headers=_headers(),
@@ -120,7 +163,7 @@ async def list_quizzes(subject_id: str, published_only: bool = False):
         if published_only:
             url += "&is_published=eq.true"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.get(url, headers=_headers())
             resp.raise_for_status()
             quizzes = resp.json()
@@ -140,7 +183,7 @@ async def submit_attempt(request: QuizAttemptRequest):
     """Student submits quiz answers. Scores and saves the attempt."""
     try:
         # Fetch the quiz
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.get(
                 f"{SUPABASE_URL}/rest/v1/quizzes?id=eq.{request.quiz_id}&select=*",
                 headers=_headers(),
@@ -180,7 +223,7 @@ async def submit_attempt(request: QuizAttemptRequest):
         score = round((correct_count / total) * 100) if total > 0 else 0
 
         # Save attempt
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.post(
                 f"{SUPABASE_URL}/rest/v1/quiz_attempts",
                 headers=_headers(),
@@ -227,7 +270,7 @@ async def quiz_history(student_id: str, subject_id: Optional[str] = None):
             # PostgREST nested filter
             url += f"&quizzes.subject_id=eq.{subject_id}"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.get(url, headers=_headers())
             resp.raise_for_status()
             attempts = resp.json()
@@ -248,7 +291,7 @@ async def quiz_history(student_id: str, subject_id: Optional[str] = None):
 async def quiz_results(quiz_id: str):
     """Faculty: get all student attempts for a specific quiz."""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with supabase_client() as client:
             resp = await client.get(
                 f"{SUPABASE_URL}/rest/v1/quiz_attempts"
                 f"?quiz_id=eq.{quiz_id}"
@@ -266,8 +309,8 @@ async def quiz_results(quiz_id: str):
 async def evaluate_answer(request: AnswerRequest):
     """Evaluate a student's quiz answer and provide feedback."""
     try:
-        generator = QuizGenerator()
-        result = generator.evaluate_answer(
+        generator = get_container().quiz_generator
+        result = await generator.aevaluate_answer(
             question=request.question,
             correct_answer=request.correct_answer,
             student_answer=request.student_answer,
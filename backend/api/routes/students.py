@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException
 import httpx
 
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from services.container import supabase_client
 
 router = APIRouter(prefix="/api/students", tags=["students"])
 
@@ -23,7 +24,7 @@ async def get_student_mastery(student_id: str):
     Also returns weak concepts for adaptive tutor prioritization.
     """
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             # Get student's learning sessions
             sessions_res = await client.get(
                 f"{SUPABASE_URL}/rest/v1/learning_sessions",
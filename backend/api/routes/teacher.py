@@ -4,6 +4,7 @@ from typing import Optional
 import httpx
 
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from services.container import supabase_client
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
 
@@ -24,7 +25,7 @@ async def get_mastery_heatmap(subject_id: Optional[str] = None):
     Color coding: Red (<40), Yellow (40-80), Green (>80).
     """
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             # Get all concepts for the subject(s)
             concepts_params = {
                 "select": "id,concept_name,subject_id,difficulty_level,order_index",
@@ -130,7 +131,7 @@ async def get_interventions(
     Default threshold: 40%. Sorted by score ascending (most at-risk first).
     """
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
+        async with supabase_client() as client:
             # Get learning sessions
             params = {"select": "student_id,concept_id,comprehension_score,subject_id"}
             if subject_id:
@@ -0,0 +1,95 @@
+"""Benchmark: local intent classifier vs. the Gemini classification call.
+
+Fits the classifier on prompts/intent_examples.py, then labels a held-out
+query set with both the LLM and the local classifier and reports agreement,
+local coverage and the latency saved per query.
+
+    cd backend && python -m benchmarks.intent_classifier [--queries FILE]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.embedding_service import EmbeddingService
+from services.intent_classifier import IntentClassifier
+from services.socratic_engine import SocraticEngine
+
+HELD_OUT_QUERIES = [
+    "what is bfs",
+    "explain alpha-beta pruning",
+    "What does completeness mean for a search algorithm?",
+    "How does greedy best first search choose the next node?",
+    "What is the difference between BFS and DFS?",
+    "Why is IDA* more memory efficient than A*?",
+    "why does minimax assume an optimal opponent",
+    "I don't get why expectiminimax has chance nodes",
+    "How do I compute the heuristic for the 8-puzzle?",
+    "Solve this tic-tac-toe position with minimax",
+    "trace uniform cost search from S to G",
+    "How can I apply depth-limited search to this maze?",
+    "Is my BFS order S, A, B, G correct?",
+    "Check my A* path cost calculation please",
+    "Am I right that alpha-beta never changes the minimax result?",
+    "is manhattan distance admissible for the 8 puzzle?",
+    "What are the types of agent environments?",
+    "Tell me about rational agents",
+    "PEAS description of a taxi driver agent",
+    "bidirectional search",
+]
+
+
+async def run(queries):
+    embedding_service = EmbeddingService()
+    classifier = IntentClassifier()
+    engine = SocraticEngine(intent_classifier=classifier)
+
+    await classifier.atrain(embedding_service.aembed_query)
+
+    llm_ms, local_ms = [], []
+    agree = decided = 0
+    for query in queries:
+        start = time.perf_counter()
+        response = await engine.model.generate_content_async(engine._intent_prompt(query))
+        llm_label = engine._parse_intent(response.text).value
+        llm_ms.append((time.perf_counter() - start) * 1000)
+
+        # Query embeddings are already computed for retrieval, so they are not timed here
+        embedding = await embedding_service.aembed_query(query)
+        start = time.perf_counter()
+        label, confidence, source = classifier.classify(query, embedding)
+        local_ms.append((time.perf_counter() - start) * 1000)
+
+        if label is not None:
+            decided += 1
+            agree += label == llm_label
+        print(f"{query[:50]:<50}  llm={llm_label:<26} local={label or '-':<26} "
+              f"{source:<9} conf={confidence:.2f}")
+
+    coverage = decided / len(queries)
+    llm_mean = statistics.mean(llm_ms)
+    local_mean = statistics.mean(local_ms)
+    print()
+    print(f"queries:                {len(queries)}")
+    print(f"decided locally:        {decided} ({coverage:.0%})")
+    print(f"agreement with LLM:     {agree}/{decided} ({agree / decided if decided else 0:.0%})")
+    print(f"LLM classify mean:      {llm_mean:.1f} ms")
+    print(f"local classify mean:    {local_mean:.3f} ms")
+    print(f"latency saved / query:  {coverage * llm_mean - local_mean:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", help="file with one query per line (default: built-in set)")
+    args = parser.parse_args()
+
+    queries = HELD_OUT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    asyncio.run(run(queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: serial vs. process-pool PDF text extraction.
+
+Extracts every PDF in a folder (default: the repository's ``ai/`` lectures)
+with 1..N worker processes, checks the parallel text matches the serial
+text page for page, and reports pages/s and speedup per worker count.
+
+    cd backend && python -m benchmarks.pdf_extraction [--dir ../ai] [--workers 1 2 4] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from services.document_processor import DocumentProcessor
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent.parent / "ai"
+
+
+def _extract_all(paths, workers: int):
+    # parallel_min_pages=1 so even short lectures take the parallel path
+    processor = DocumentProcessor(extract_workers=workers, parallel_min_pages=1)
+    return {path: list(processor.iter_pages(str(path))) for path in paths}
+
+
+def run(folder: Path, worker_counts, repeat: int):
+    paths = sorted(folder.glob("*.pdf"))
+    if not paths:
+        print(f"No PDFs found in {folder}")
+        return
+
+    baseline = _extract_all(paths, 1)
+    pages = sum(len(p) for p in baseline.values())
+    print(f"folder:   {folder}")
+    print(f"PDFs:     {len(paths)}  ({pages} pages, {sum(p.stat().st_size for p in paths) / 1e6:.1f} MB)")
+    print(f"CPUs:     {os.cpu_count()}")
+    print()
+    print(f"{'workers':>7}  {'median s':>9}  {'pages/s':>8}  {'speedup':>7}  identical")
+
+    serial_s = None
+    for workers in worker_counts:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = _extract_all(paths, workers)
+            samples.append(time.perf_counter() - start)
+        seconds = statistics.median(samples)
+        serial_s = serial_s or (seconds if workers == 1 else None)
+        speedup = f"{serial_s / seconds:6.2f}x" if serial_s else "    n/a"
+        identical = "yes" if result == baseline else "NO"
+        print(f"{workers:>7}  {seconds:>9.2f}  {pages / seconds:>8.1f}  {speedup:>7}  {identical}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", type=Path, default=DEFAULT_DIR, help="folder of PDFs")
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="worker counts to compare (include 1 for the serial baseline)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.dir, args.workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: wire encoding of embeddings for PostgREST inserts and RPC calls.
+
+Compares ``json.dumps`` of Python float lists (what Gemini returns, and what
+float32 values widened by ``.tolist()`` look like) with the bounded-precision
+pgvector literal from ``services.vector_codec``. Reports encode time per
+vector, bytes per vector and the worst cosine error after a round trip.
+
+    cd backend && python -m benchmarks.vector_encoding [--count 2000] [--dim 768] [--precision 6 8]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from services.vector_codec import parse_pgvector, to_pgvector
+
+
+def _vectors(count: int, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _measure(name: str, encode, inputs, vectors: np.ndarray, baseline_bytes=None):
+    start = time.perf_counter()
+    encoded = [encode(item) for item in inputs]
+    seconds = time.perf_counter() - start
+
+    size = sum(len(text.encode("utf-8")) for text in encoded) / len(encoded)
+    decoded = np.vstack([parse_pgvector(text) for text in encoded])
+    cosine = np.sum(decoded * vectors, axis=1) / (
+        np.linalg.norm(decoded, axis=1) * np.linalg.norm(vectors, axis=1)
+    )
+    ratio = f"{size / baseline_bytes:5.2f}x" if baseline_bytes else "  1.00x"
+    print(
+        f"{name:<34} {seconds / len(encoded) * 1e6:>9.1f}  {size:>9.0f}  {ratio:>7}"
+        f"  {float(np.max(np.abs(1 - cosine))):>10.2e}"
+    )
+    return size
+
+
+def run(count: int, dim: int, precisions):
+    vectors = _vectors(count, dim)
+    # The API's JSON floats: shortest repr of ~9 significant digits
+    api_lists = [[float(f"{v:.9g}") for v in row] for row in vectors.tolist()]
+    widened = [row.tolist() for row in vectors]
+
+    print(f"vectors:  {count} x {dim} (unit-norm float32)")
+    print()
+    print(f"{'encoding':<34} {'us/vector':>9}  {'bytes':>9}  {'size':>7}  {'max |1-cos|':>10}")
+    baseline = _measure("json.dumps(API floats)", json.dumps, api_lists, vectors)
+    _measure("json.dumps(float32 .tolist())", json.dumps, widened, vectors, baseline)
+    for precision in precisions:
+        _measure(
+            f"to_pgvector(float32, {precision} digits)",
+            lambda vector, p=precision: to_pgvector(vector, p),
+            list(vectors),
+            vectors,
+            baseline,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--precision", type=int, nargs="+", default=[6, 8])
+    args = parser.parse_args()
+    run(args.count, args.dim, args.precision)
+
+
+if __name__ == "__main__":
+    main()
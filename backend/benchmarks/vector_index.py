@@ -0,0 +1,91 @@
+"""Benchmark: local per-subject vector index vs. the match_embeddings RPC.
+
+Loads one subject into LocalVectorIndex, then runs the same query embeddings
+through both paths and reports latency and top-k overlap.
+
+    cd backend && python -m benchmarks.vector_index --subject <course_id> [--runs 5]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from config.rag_config import RAG_SETTINGS
+from config.settings import AI_COURSE_ID
+from services.embedding_service import EmbeddingService
+from services.local_index import LocalVectorIndex
+from services.vector_store import VectorStore
+
+QUERIES = [
+    "what is breadth first search",
+    "explain alpha-beta pruning",
+    "admissible heuristic in A* search",
+    "components of a search problem",
+    "difference between DFS and iterative deepening",
+    "minimax algorithm for adversarial games",
+    "structure of intelligent agents",
+    "stochastic games and chance nodes",
+]
+
+
+def _pct(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(subject_id: str, runs: int, top_k: int):
+    threshold = RAG_SETTINGS["relevance_threshold"]
+    embedding_service = EmbeddingService()
+    embeddings = [await embedding_service.aembed_query(q) for q in QUERIES]
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        index = LocalVectorIndex(ahttp=client)
+        rpc_store = VectorStore(ahttp=client)
+
+        start = time.perf_counter()
+        subject = await index.aload(subject_id)
+        load_s = time.perf_counter() - start
+        if subject is None:
+            print("Subject could not be loaded into the local index (empty, oversized or error).")
+            return
+
+        rpc_ms, local_ms, overlaps = [], [], []
+        for _ in range(runs):
+            for emb in embeddings:
+                start = time.perf_counter()
+                remote = await rpc_store.asimilarity_search(emb, subject_id, top_k, threshold)
+                rpc_ms.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                local = subject.search(emb, top_k, threshold)
+                local_ms.append((time.perf_counter() - start) * 1000)
+
+                remote_ids = {str(r.get("id")) for r in remote}
+                local_ids = {str(r.get("id")) for r in local}
+                if remote_ids:
+                    overlaps.append(len(remote_ids & local_ids) / len(remote_ids))
+
+    print(f"subject:            {subject_id}")
+    print(f"chunks indexed:     {len(subject.rows)}  (load {load_s:.2f} s)")
+    print(f"searches:           {len(rpc_ms)}  (top_k={top_k}, threshold={threshold})")
+    print(f"RPC    mean / p95:  {statistics.mean(rpc_ms):8.2f} / {_pct(rpc_ms, 0.95):8.2f} ms")
+    print(f"local  mean / p95:  {statistics.mean(local_ms):8.3f} / {_pct(local_ms, 0.95):8.3f} ms")
+    if overlaps:
+        print(f"top-k overlap:      {statistics.mean(overlaps):.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subject", default=AI_COURSE_ID, help="course_id to benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=RAG_SETTINGS["retrieval_top_k"] * 2)
+    args = parser.parse_args()
+    if not args.subject:
+        parser.error("--subject is required (VITE_AI_COURSE_ID is not set)")
+    asyncio.run(run(args.subject, args.runs, args.top_k))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,157 @@
 RAG_SETTINGS = {
-    # Chunking
-    "chunk_size": 800,
-    "chunk_overlap": 100,
+    # Chunking — uploads are chunked by estimated tokens along paragraphs/sentences
     "min_chunk_size": 100,
+    "chunk_max_tokens": 256,
+    "chunk_overlap_tokens": 40,
 
     # Retrieval
     "retrieval_top_k": 5,
     "relevance_threshold": 0.7,
 
-    # Hybrid Search
+    # Hybrid Search — legs are fused with reciprocal-rank fusion
+    "rrf_k": 60,
     "semantic_weight": 0.7,
-    "keyword_weight": 0.3,
+    "keyword_weight": 0.3,  # caps the relevance of keyword-only hits
+    "hybrid_leg_timeout_s": 4.0,  # a late leg is dropped, the other still returns
 
     # Context
     "max_context_tokens": 4000,
+    "context_dedup_threshold": 0.8,  # shingle containment that marks a near-duplicate chunk
     "include_sources": True,
 }
 
+LOCAL_INDEX_CONFIG = {
+    "enabled": True,
+    "refresh_interval_s": 60,          # incremental refresh by created_at
+    # created_at is the transaction start, and concurrent inserts commit out of
+    # order: each refresh re-reads this far behind the newest row it has seen
+    "refresh_lookback_s": 120,
+    "max_chunks_per_subject": 50000,   # larger subjects stay on the RPC
+    "page_size": 1000,
+}
+
+BM25_CONFIG = {
+    "k1": 1.5,
+    "b": 0.75,
+}
+
+RESPONSE_CACHE_CONFIG = {
+    "max_entries": 2000,
+    "similarity_threshold": 0.95,  # cosine between question embeddings
+    "ttl_seconds": 6 * 3600,
+    "mastery_bands": (0.3, 0.7),   # low < 0.3 <= mid < 0.7 <= high
+}
+
 SOCRATIC_CONFIG = {
     "min_mastery_for_advanced": 0.7,
     "max_hints_per_query": 3,
     "encourage_self_discovery": True,
 }
 
+INTENT_CLASSIFIER_CONFIG = {
+    # Below this local confidence the Gemini classifier is consulted
+    "confidence_threshold": 0.6,
+}
+
+EMBEDDING_CACHE_CONFIG = {
+    "max_entries": 5000,
+    "ttl_seconds": 24 * 3600,
+    # Chunk embedding store: least recently used rows beyond chunk_max_rows, and
+    # rows unused for chunk_ttl_seconds, are evicted (~3 KB per 768-dim row)
+    "chunk_max_rows": 200_000,
+    "chunk_ttl_seconds": 90 * 24 * 3600,
+}
+
 EMBEDDING_CONFIG = {
     "model": "models/text-embedding-004",
     "task_type_document": "retrieval_document",
     "task_type_query": "retrieval_query",
     "dimension": 768,
+    # Significant digits per value in the pgvector literal sent to PostgREST
+    # (float32 carries ~7; 6 keeps cosine scores within ~1e-6)
+    "wire_precision": 6,
+    # Multi-input embedding calls (batchEmbedContents accepts up to 100 texts)
+    "batch_max_items": 100,
+    "batch_max_chars": 60000,
+    "batch_max_retries": 3,
+}
+
+# knowledge_base bulk writes (VectorStore.bulk_insert)
+BULK_INSERT_CONFIG = {
+    "max_payload_bytes": 1_000_000,  # per POST; a 768-d embedding row is ~8 KB
+    "max_rows": 500,
+    "concurrency": 4,
+    "max_retries": 3,
+    "retry_backoff_s": 0.5,
+    "timeout_s": 60.0,
+}
+
+# Near-duplicate chunks at ingestion (services/near_duplicates.py)
+DEDUP_CONFIG = {
+    "enabled": True,
+    # link: store it with metadata.duplicate_of (retrieval folds the pair into one hit);
+    # skip: neither embed nor store the duplicate — its text is lost if the original is deleted
+    "action": "link",
+    "threshold": 0.8,      # estimated Jaccard similarity of word shingles
+    "num_perm": 128,
+    "bands": 16,           # 16 bands x 8 rows: ~99% recall at 0.85, ~6% candidates at 0.5
+    "shingle_words": 3,
+}
+
+# GET /api/documents/stats (services/document_catalog.py)
+DOCUMENT_CATALOG_CONFIG = {
+    "max_age_s": 900,       # older catalogs are re-synced from knowledge_base in the background
+    "default_limit": 50,
+    "max_limit": 500,
+}
+
+INGESTION_CONFIG = {
+    "workers": 2,
+    # A job recovered from this many crashes (its owner stopped heartbeating) is
+    # marked failed; a graceful shutdown hands the job back without counting
+    "max_attempts": 3,
+    # Running jobs record their owner's heartbeat; other processes requeue a
+    # job only once its heartbeat is older than stale_after_s
+    "heartbeat_s": 10,
+    "stale_after_s": 60,
+    # Process-pool text extraction for large PDFs (capped at the CPU count)
+    "extract_workers": 4,
+    "parallel_min_pages": 32,
+}
+
+QUIZ_CONFIG = {
+    "context_limit": 10,
+    "fetch_timeout_s": 10.0,
+}
+
+QUESTION_BANK_CONFIG = {
+    "enabled": True,
+    "target_size": 40,  # drawable questions per (subject, topic, difficulty) after a refill
+    "low_watermark": 20,  # refill in the background below this
+    "batch_size": 10,  # questions per Gemini generation
+    "max_batches": 6,  # generations per fill
+    "max_serves": 3,  # quizzes a question may appear in
+    # Also kept warm when a topic is drawn (create_quiz uses mastery 0.5)
+    "prefill_difficulties": ["intermediate", "advanced"],
+}
+
+# Shared per-API limiters (see services/rate_limiter.py). ``rate`` is requests/s;
+# concurrency starts at ``initial_concurrency`` and adapts between min/max.
+RATE_LIMIT_CONFIG = {
+    "embedding": {
+        "rate": 20.0,
+        "burst": 20,
+        "min_concurrency": 1,
+        "max_concurrency": 8,
+        "initial_concurrency": 4,
+    },
+    "generation": {
+        "rate": 10.0,
+        "burst": 10,
+        "min_concurrency": 2,
+        "max_concurrency": 32,
+        "initial_concurrency": 8,
+    },
 }
 
 GEMINI_CONFIG = {
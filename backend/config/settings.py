@@ -12,6 +12,25 @@ SUPABASE_URL = os.getenv("VITE_SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.getenv("VITE_SUPABASE_ANON_KEY", "")
 AI_COURSE_ID = os.getenv("VITE_AI_COURSE_ID", "")
 
+# Optional on-disk tier for the query-embedding cache (SQLite file path)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+# Persistent content-hash cache of document chunk embeddings ("" disables it)
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+CHUNK_EMBEDDING_CACHE_PATH = os.getenv(
+    "CHUNK_EMBEDDING_CACHE_PATH", str(CACHE_DIR / "chunk_embeddings.sqlite3")
+)
+
+# Background ingestion queue: job table + spooled PDFs awaiting processing
+INGESTION_DB_PATH = os.getenv("INGESTION_DB_PATH", str(CACHE_DIR / "ingestion_jobs.sqlite3"))
+INGESTION_SPOOL_DIR = os.getenv("INGESTION_SPOOL_DIR", str(CACHE_DIR / "ingest_spool"))
+
+# Per-subject document counts served by GET /api/documents/stats
+DOCUMENT_CATALOG_PATH = os.getenv("DOCUMENT_CATALOG_PATH", str(CACHE_DIR / "document_catalog.sqlite3"))
+
+# Pre-generated quiz questions per (subject, topic, difficulty)
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", str(CACHE_DIR / "question_bank.sqlite3"))
+
 # Validate required env vars
 _required = {
     "GEMINI_API_KEY": GEMINI_API_KEY,
@@ -2,17 +2,31 @@
 AI Academic Agent — FastAPI Backend
 Phase 3: Interaction & Interfaces
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import time
 
 from api.routes import documents, chat, quiz, diagrams
 from api.routes import teacher, admin, students
+from services.container import init_container, shutdown_container
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared services + keep-alive HTTP pools live for the whole app lifetime
+    container = init_container()
+    # Ingestion workers resume any jobs left queued/running by the last process
+    await container.ingestion_jobs.start()
+    yield
+    await shutdown_container()
+
 
 app = FastAPI(
     title="AI Academic Agent API",
     description="Intelligence Layer + Interaction & Interfaces",
     version="3.0.0",
+    lifespan=lifespan,
 )
 
 # CORS — allow Vercel production + localhost dev
@@ -0,0 +1,44 @@
+"""Intent Seed Examples — labelled student queries used to fit the local intent classifier."""
+
+INTENT_EXAMPLES = {
+    "conceptual_understanding": [
+        "What is breadth-first search?",
+        "Explain alpha-beta pruning",
+        "What is an intelligent agent?",
+        "Define admissible heuristic",
+        "How does the minimax algorithm work?",
+        "What are the components of a search problem?",
+        "Describe iterative deepening search",
+        "What is a stochastic game?",
+    ],
+    "problem_solving": [
+        "How do I solve this 8-puzzle using A*?",
+        "Trace BFS on this graph starting from node A",
+        "Calculate the minimax value of the root for this game tree",
+        "How can I find the shortest path with uniform cost search?",
+        "Apply alpha-beta pruning to the following tree",
+        "Compute f(n) for each node using this heuristic",
+        "Work through depth-limited search with limit 2",
+        "How would I implement IDA* for this problem?",
+    ],
+    "clarification": [
+        "Why does A* need an admissible heuristic?",
+        "Why is DFS not optimal?",
+        "I don't understand why alpha-beta prunes that branch",
+        "What do you mean by branching factor?",
+        "Why do we use a queue in BFS instead of a stack?",
+        "Why can't greedy best-first search guarantee the shortest path?",
+        "I'm confused about why the frontier grows exponentially",
+        "Why would bidirectional search be faster?",
+    ],
+    "verification": [
+        "Is my answer of 7 for the minimax value correct?",
+        "Did I get the BFS traversal order right: A, B, C, D?",
+        "Can you check my solution to the A* problem?",
+        "Is it true that UCS is optimal with positive costs?",
+        "Am I right that DFS uses less memory than BFS?",
+        "Is this heuristic admissible?",
+        "Verify my alpha-beta pruning steps",
+        "So does that mean IDDFS is complete?",
+    ],
+}
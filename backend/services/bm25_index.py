@@ -0,0 +1,87 @@
+"""BM25 Index — in-process inverted index with Okapi BM25 scoring."""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+import math
+import re
+
+from config.rag_config import BM25_CONFIG
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-*'][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its "
+    "me my of on or so than that the their then there these this to was we what "
+    "when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        tok for tok in _TOKEN_RE.findall(text.lower())
+        if len(tok) > 1 and tok not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Term → {doc id: term frequency} postings over chunk rows.
+
+    Supports incremental ``add``/``remove`` so a subject's index tracks
+    uploads and deletes without a rebuild.
+    """
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = BM25_CONFIG["k1"] if k1 is None else k1
+        self.b = BM25_CONFIG["b"] if b is None else b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.docs: Dict[str, Dict] = {}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, rows: Iterable[Dict]) -> None:
+        for row in rows:
+            doc_id = str(row["id"])
+            if doc_id in self.docs:
+                continue
+            tf = Counter(tokenize(row.get("content", "") or ""))
+            self.docs[doc_id] = row
+            self.doc_terms[doc_id] = tf
+            length = sum(tf.values())
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            for term, count in tf.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_ids: Iterable) -> None:
+        for doc_id in map(str, doc_ids):
+            if doc_id not in self.docs:
+                continue
+            for term in self.doc_terms.pop(doc_id):
+                posting = self.postings[term]
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+            self.total_len -= self.doc_len.pop(doc_id)
+            del self.docs[doc_id]
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[Dict, float]]:
+        """Return up to ``limit`` (row, bm25 score) pairs, best first."""
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = self.total_len / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [(self.docs[doc_id], score) for doc_id, score in ranked]
@@ -0,0 +1,209 @@
+"""Service Container — app-lifetime service singletons and pooled HTTP clients.
+
+Built once in the FastAPI lifespan (see ``main.py``). Routes pull shared
+services from ``get_container()`` instead of constructing them per request,
+so Gemini clients and keep-alive connections to Supabase are reused.
+"""
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import threading
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+from services.gemini_client import configure_gemini
+from services.embedding_service import EmbeddingService
+from services.vector_store import VectorStore
+from services.local_index import LocalVectorIndex
+from services.socratic_engine import SocraticEngine
+from services.rag_service import RAGService
+from services.quiz_generator import QuizGenerator
+from services.ingestion import IngestionService
+from services.ingestion_jobs import IngestionWorkerPool
+from services.near_duplicates import NearDuplicateIndex
+from services.document_catalog import DocumentCatalog
+from services.question_bank import QuestionBank
+from services.rate_limiter import limiter_snapshots
+from services.parallel_extraction import shutdown_pool
+from config.rag_config import DEDUP_CONFIG, QUESTION_BANK_CONFIG
+from config.settings import DOCUMENT_CATALOG_PATH, QUESTION_BANK_PATH
+
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0,
+)
+HTTP_DEFAULT_TIMEOUT = 15.0
+
+
+class ConnectionStats:
+    """Counts requests vs. newly opened connections on the shared pools.
+
+    Uses httpcore's ``trace`` request extension: every new TCP connection
+    emits ``connection.connect_tcp.*`` and every TLS handshake emits
+    ``connection.start_tls.*``. Reused keep-alive connections emit neither.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def _record(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def _trace(self, event_name: str, info: Dict) -> None:
+        self._record(event_name)
+
+    async def _atrace(self, event_name: str, info: Dict) -> None:
+        self._record(event_name)
+
+    def _on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _aon_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._atrace
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            requests = self.requests
+            new_connections = self.new_connections
+            tls_handshakes = self.tls_handshakes
+        reused = max(requests - new_connections, 0)
+        return {
+            "requests": requests,
+            "new_connections": new_connections,
+            "tls_handshakes": tls_handshakes,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / requests, 4) if requests else 0.0,
+            "http2": HAS_H2,
+        }
+
+
+class ServiceContainer:
+    """Holds the shared HTTP pools and service singletons for the app lifetime."""
+
+    def __init__(self):
+        configure_gemini()
+        self.connection_stats = ConnectionStats()
+
+        # Async pool for request handlers, sync pool for ingestion paths
+        self.ahttp = httpx.AsyncClient(
+            http2=HAS_H2,
+            limits=HTTP_POOL_LIMITS,
+            timeout=HTTP_DEFAULT_TIMEOUT,
+            event_hooks={"request": [self.connection_stats._aon_request]},
+        )
+        self.http = httpx.Client(
+            http2=HAS_H2,
+            limits=HTTP_POOL_LIMITS,
+            timeout=HTTP_DEFAULT_TIMEOUT,
+            event_hooks={"request": [self.connection_stats._on_request]},
+        )
+
+        self.embedding_service = EmbeddingService()
+        self.local_index = LocalVectorIndex(ahttp=self.ahttp)
+        self.vector_store = VectorStore(
+            http=self.http, ahttp=self.ahttp, local_index=self.local_index
+        )
+        self.socratic_engine = SocraticEngine()
+        self.rag_service = RAGService(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store,
+            socratic_engine=self.socratic_engine,
+        )
+        self.quiz_generator = QuizGenerator(ahttp=self.ahttp, rag_service=self.rag_service)
+        self.question_bank = (
+            QuestionBank(QUESTION_BANK_PATH, self.quiz_generator)
+            if QUESTION_BANK_CONFIG["enabled"] else None
+        )
+        self.near_duplicates = (
+            NearDuplicateIndex(self.vector_store) if DEDUP_CONFIG["enabled"] else None
+        )
+        self.document_catalog = DocumentCatalog(DOCUMENT_CATALOG_PATH, self.vector_store)
+        self.ingestion_service = IngestionService(
+            embedding_service=self.embedding_service,
+            vector_store=self.vector_store,
+            local_index=self.local_index,
+            response_cache=self.rag_service.response_cache,
+            near_duplicates=self.near_duplicates,
+            catalog=self.document_catalog,
+            question_bank=self.question_bank,
+        )
+        self.ingestion_jobs = IngestionWorkerPool(self.ingestion_service)
+
+    def metrics(self) -> Dict:
+        """Service-level metrics for the admin health endpoint."""
+        return {
+            "connections": self.connection_stats.snapshot(),
+            "query_embedding_cache": self.embedding_service.query_cache.stats(),
+            "chunk_embedding_cache": self.embedding_service.chunk_cache.stats(),
+            "intent_classifier": self.socratic_engine.intent_classifier.snapshot(),
+            "stream_ttft": self.rag_service.stream_ttft.snapshot(),
+            "response_cache": self.rag_service.response_cache.stats(),
+            "local_index": self.local_index.snapshot(),
+            "rate_limiters": limiter_snapshots(),
+            "ingestion_jobs": self.ingestion_jobs.snapshot(),
+            "near_duplicates": self.near_duplicates.stats() if self.near_duplicates else None,
+            "document_catalog": self.document_catalog.stats(),
+            "quiz_context": dict(self.quiz_generator.counters),
+            "question_bank": self.question_bank.stats() if self.question_bank else None,
+        }
+
+    async def aclose(self) -> None:
+        await self.ingestion_jobs.stop()
+        if self.question_bank is not None:
+            await self.question_bank.aclose()
+        shutdown_pool()
+        await self.ahttp.aclose()
+        self.http.close()
+
+
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def init_container() -> ServiceContainer:
+    """Create the process-wide container (idempotent)."""
+    global _container
+    with _container_lock:
+        if _container is None:
+            _container = ServiceContainer()
+        return _container
+
+
+def get_container() -> ServiceContainer:
+    """Return the shared container, creating it lazily outside the app lifespan."""
+    return _container or init_container()
+
+
+async def shutdown_container() -> None:
+    """Close pooled connections; called from the app lifespan on shutdown."""
+    global _container
+    with _container_lock:
+        container, _container = _container, None
+    if container is not None:
+        await container.aclose()
+
+
+@asynccontextmanager
+async def supabase_client():
+    """Yield the shared async client (drop-in for ``async with httpx.AsyncClient()``).
+
+    The pool is owned by the container, so leaving the block does not close it.
+    """
+    yield get_container().ahttp
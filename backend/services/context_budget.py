@@ -0,0 +1,161 @@
+"""Context Budget — token estimation and budgeted, de-duplicated context assembly."""
+from typing import Callable, Dict, List, Optional, Set
+import math
+import re
+
+from config.rag_config import RAG_SETTINGS
+
+# Gemini tokenizers average ~4 characters per token on English prose
+CHARS_PER_TOKEN = 4
+SHINGLE_SIZE = 5
+MIN_TRIMMED_TOKENS = 60
+_WORD = re.compile(r"\S+")
+_LAST_WORD = re.compile(r"\s+\S*$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer call)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _shingles(words: List[str]) -> Set[int]:
+    if len(words) < SHINGLE_SIZE:
+        return {hash(" ".join(words))} if words else set()
+    return {
+        hash(" ".join(words[i:i + SHINGLE_SIZE]))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _strip_overlap(previous: List[str], current: List[str], probe: int = 8) -> List[str]:
+    """Drop the prefix of ``current`` that repeats the tail of ``previous``.
+
+    Chunks are produced with a word overlap, so consecutive chunks of the same
+    document start with the end of the previous chunk.
+    """
+    if len(current) < probe or len(previous) < probe:
+        return current
+    head = current[:probe]
+    for start in range(max(0, len(previous) - len(current)), len(previous) - probe + 1):
+        if previous[start:start + probe] == head:
+            tail = previous[start:]
+            if current[:len(tail)] == tail:
+                return current[len(tail):]
+    return current
+
+
+def _cut_at_word(text: str, max_chars: int) -> str:
+    """``text`` cut to at most ``max_chars`` without splitting a word (line breaks kept)."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    if not text[max_chars].isspace():
+        match = _LAST_WORD.search(head)
+        if match:
+            head = head[:match.start()]
+    return head.rstrip()
+
+
+def _doc_text(doc: Dict) -> str:
+    return doc.get("content", "") or doc.get("chunk_text", "")
+
+
+def page_label(doc: Dict) -> str:
+    """", p. 4" / ", pp. 4-6" from chunk metadata written by the chunker, else ""."""
+    metadata = doc.get("metadata") or {}
+    if not isinstance(metadata, dict) or not metadata.get("page_start"):
+        return ""
+    start, end = metadata["page_start"], metadata.get("page_end") or metadata["page_start"]
+    return f", p. {start}" if start == end else f", pp. {start}-{end}"
+
+
+def _default_format(i: int, doc: Dict, text: str) -> str:
+    score = doc.get("score", 0) or doc.get("similarity", 0)
+    source = doc.get("source_document", "Unknown")
+    return f"[Source {i}: {source}{page_label(doc)}] (Relevance: {score:.2f})\n{text}"
+
+
+def assemble_budgeted_context(
+    docs: List[Dict],
+    max_tokens: Optional[int] = None,
+    formatter: Callable[[int, Dict, str], str] = _default_format,
+    separator: str = "\n\n---\n\n",
+    dedup_threshold: Optional[float] = None,
+) -> Dict:
+    """Assemble ``docs`` into a context string within ``max_tokens``.
+
+    Docs are taken in relevance order (``score``/``similarity``; input order
+    breaks ties). Near-duplicates (shingle containment >= ``dedup_threshold``)
+    are dropped, the overlap repeated from an earlier chunk of the same
+    document is stripped, and the last doc that does not fit is trimmed at a
+    word boundary. Returns the context plus token accounting.
+    """
+    max_tokens = max_tokens or RAG_SETTINGS["max_context_tokens"]
+    dedup_threshold = dedup_threshold or RAG_SETTINGS["context_dedup_threshold"]
+
+    ranked = sorted(
+        enumerate(docs),
+        key=lambda pair: (-(pair[1].get("score", 0) or pair[1].get("similarity", 0)), pair[0]),
+    )
+
+    parts: List[str] = []
+    kept_shingles: List[Set[int]] = []
+    kept_words: Dict[str, List[List[str]]] = {}
+    used = 0
+    sep_tokens = estimate_tokens(separator)
+    stats = {"duplicates_dropped": 0, "overlap_trimmed": 0, "truncated": 0, "over_budget": 0}
+
+    for _, doc in ranked:
+        # Words drive matching; the text itself is cut by offset so line breaks survive
+        text = _doc_text(doc)
+        spans = list(_WORD.finditer(text))
+        words = [span.group() for span in spans]
+        if not words:
+            continue
+        shingles = _shingles(words)
+        if any(
+            len(shingles & other) / min(len(shingles), len(other)) >= dedup_threshold
+            for other in kept_shingles if other and shingles
+        ):
+            stats["duplicates_dropped"] += 1
+            continue
+
+        source = doc.get("source_document", "")
+        for previous in kept_words.get(source, []):
+            stripped = _strip_overlap(previous, words)
+            if len(stripped) < len(words):
+                if stripped:
+                    text = text[spans[len(words) - len(stripped)].start():]
+                words = stripped
+                stats["overlap_trimmed"] += 1
+                break
+        if not words:
+            stats["duplicates_dropped"] += 1
+            continue
+
+        text = text.strip()
+        block = formatter(len(parts) + 1, doc, text)
+        cost = estimate_tokens(block) + (sep_tokens if parts else 0)
+        if used + cost > max_tokens:
+            remaining = max_tokens - used - (sep_tokens if parts else 0) - estimate_tokens(formatter(len(parts) + 1, doc, ""))
+            if remaining < MIN_TRIMMED_TOKENS:
+                stats["over_budget"] += 1
+                continue
+            text = _cut_at_word(text, remaining * CHARS_PER_TOKEN) + " …"
+            block = formatter(len(parts) + 1, doc, text)
+            cost = estimate_tokens(block) + (sep_tokens if parts else 0)
+            stats["truncated"] += 1
+
+        parts.append(block)
+        kept_shingles.append(shingles)
+        kept_words.setdefault(source, []).append(_doc_text(doc).split())
+        used += cost
+
+    return {
+        "context": separator.join(parts),
+        "tokens_used": used,
+        "token_budget": max_tokens,
+        "chunks_used": len(parts),
+        "chunks_available": len(docs),
+        **stats,
+    }
@@ -0,0 +1,193 @@
+"""Document Catalog — per-subject document counts kept in SQLite for the stats endpoint.
+
+Each subject's catalog is built once from knowledge_base (one grouped query,
+or a narrow two-column scan when PostgREST aggregates are disabled) and then
+maintained as documents are ingested or deleted through the API, so a stats
+page is an indexed SQLite read. Catalogs older than ``max_age_s`` are still
+served but re-synced in the background, which picks up writes made outside
+the API (e.g. ``scripts/bulk_upload.py``).
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from config.rag_config import DOCUMENT_CATALOG_CONFIG
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class DocumentCatalog:
+    """SQLite table of ``(subject, document) → chunks, uploaded_at, updated_at``."""
+
+    def __init__(self, db_path: str, vector_store=None, max_age_s: Optional[float] = None):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.vector_store = vector_store
+        self.max_age_s = max_age_s if max_age_s is not None else DOCUMENT_CATALOG_CONFIG["max_age_s"]
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_documents ("
+            " subject_id TEXT NOT NULL, source_document TEXT NOT NULL,"
+            " chunks INTEGER NOT NULL, uploaded_at TEXT, updated_at TEXT,"
+            " PRIMARY KEY (subject_id, source_document))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS catalog_documents_order"
+            " ON catalog_documents (subject_id, uploaded_at, source_document)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_subjects ("
+            " subject_id TEXT PRIMARY KEY, synced_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters = {"reads": 0, "syncs": 0, "background_syncs": 0}
+
+    # ─── Sync from knowledge_base ───
+
+    def sync(self, subject_id: str) -> None:
+        """Rebuild a subject's catalog from knowledge_base."""
+        documents = self.vector_store.document_stats(subject_id)
+        with self._lock:
+            self._conn.execute("DELETE FROM catalog_documents WHERE subject_id = ?", (subject_id,))
+            self._conn.executemany(
+                "INSERT INTO catalog_documents (subject_id, source_document, chunks, uploaded_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (subject_id, d.get("source_document") or "Unknown", int(d.get("chunks") or 0),
+                     d.get("uploaded_at"), d.get("updated_at"))
+                    for d in documents
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO catalog_subjects (subject_id, synced_at) VALUES (?, ?)",
+                (subject_id, time.time()),
+            )
+            self._conn.commit()
+            self.counters["syncs"] += 1
+
+    def synced_at(self, subject_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM catalog_subjects WHERE subject_id = ?", (subject_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def refresh_in_background(self, subject_id: str) -> None:
+        """Re-sync a stale subject off the request path (one refresh per subject at a time)."""
+        with self._lock:
+            if subject_id in self._refreshing:
+                return
+            self._refreshing.add(subject_id)
+
+        async def _refresh():
+            try:
+                await asyncio.to_thread(self.sync, subject_id)
+                with self._lock:
+                    self.counters["background_syncs"] += 1
+            except Exception as e:
+                print(f"[DocumentCatalog] refresh error for {subject_id}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(subject_id)
+
+        task = asyncio.create_task(_refresh())
+        self._tasks.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._tasks.discard)
+
+    # ─── Maintenance on upload/delete ───
+
+    def record_ingestion(
+        self, subject_id: str, source_document: str, rows_added: int, rows_total: Optional[int] = None
+    ) -> None:
+        """Apply a finished upload: ``rows_total`` replaces the count (upsert), else add ``rows_added``."""
+        now = _now_iso()
+        with self._lock:
+            if rows_total is not None:
+                self._conn.execute(
+                    "INSERT INTO catalog_documents (subject_id, source_document, chunks, uploaded_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (subject_id, source_document) DO UPDATE SET"
+                    " chunks = excluded.chunks, updated_at = excluded.updated_at",
+                    (subject_id, source_document, rows_total, now, now),
+                )
+            else:
+                self._conn.execute(
+                    "INSERT INTO catalog_documents (subject_id, source_document, chunks, uploaded_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (subject_id, source_document) DO UPDATE SET"
+                    " chunks = chunks + excluded.chunks, updated_at = excluded.updated_at",
+                    (subject_id, source_document, rows_added, now, now),
+                )
+            self._conn.execute(
+                "DELETE FROM catalog_documents WHERE subject_id = ? AND source_document = ? AND chunks <= 0",
+                (subject_id, source_document),
+            )
+            self._conn.commit()
+
+    def remove_document(self, subject_id: str, source_document: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM catalog_documents WHERE subject_id = ? AND source_document = ?",
+                (subject_id, source_document),
+            )
+            self._conn.commit()
+
+    # ─── Reads ───
+
+    def page(self, subject_id: str, limit: int, offset: int = 0) -> Dict:
+        """One page of a subject's documents (oldest upload first) plus subject totals."""
+        with self._lock:
+            total_documents, total_chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM catalog_documents WHERE subject_id = ?",
+                (subject_id,),
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT source_document, chunks, uploaded_at, updated_at FROM catalog_documents"
+                " WHERE subject_id = ? ORDER BY uploaded_at, source_document LIMIT ? OFFSET ?",
+                (subject_id, limit, offset),
+            ).fetchall()
+            self.counters["reads"] += 1
+        documents: List[Dict] = [
+            {"document": name, "chunks": chunks, "uploaded_at": uploaded_at, "updated_at": updated_at}
+            for name, chunks, uploaded_at, updated_at in rows
+        ]
+        return {
+            "subject_id": subject_id,
+            "total_chunks": total_chunks,
+            "total_documents": total_documents,
+            "documents": documents,
+            "limit": limit,
+            "offset": offset,
+        }
+
+    async def aget_page(self, subject_id: str, limit: int, offset: int = 0, refresh: bool = False) -> Dict:
+        """Catalog page for the stats endpoint.
+
+        The first request for a subject (or ``refresh=True``) syncs before
+        answering; afterwards reads come from SQLite and a catalog older than
+        ``max_age_s`` is re-synced in the background.
+        """
+        synced_at = self.synced_at(subject_id)
+        if synced_at is None or refresh:
+            await asyncio.to_thread(self.sync, subject_id)
+            synced_at = self.synced_at(subject_id)
+        elif time.time() - synced_at > self.max_age_s:
+            self.refresh_in_background(subject_id)
+        result = await asyncio.to_thread(self.page, subject_id, limit, offset)
+        result["synced_at"] = datetime.fromtimestamp(synced_at, timezone.utc).isoformat()
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            subjects = self._conn.execute("SELECT COUNT(*) FROM catalog_subjects").fetchone()[0]
+            return {**self.counters, "subjects": subjects, "refreshing": len(self._refreshing)}
@@ -1,6 +1,9 @@
 """Document Processing Service — PDF extraction and chunking."""
+import io
 import re
-from typing import List, Dict, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from services.context_budget import CHARS_PER_TOKEN, estimate_tokens
 
 try:
     from pypdf import PdfReader
@@ -14,109 +17,217 @@ try:
 except ImportError:
     HAS_FITZ = False
 
+# PDF bytes in memory, or a path to a PDF on disk (read lazily page by page)
+PdfSource = Union[bytes, str]
 
-class DocumentProcessor:
-    """Extracts text from PDFs and splits into semantically meaningful chunks."""
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t\f\v\r]*\n")
+_LIST_ITEM = re.compile(r"^(?:[•▪◦●○■□➢➤►✓\-–*]|\d{1,2}[.)]|[a-z][.)])\s+")
 
-    def __init__(self, chunk_size: int = 800, chunk_overlap: int = 100):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
 
-    def extract_text_from_bytes(self, pdf_bytes: bytes, filename: str = "") -> Dict:
-        """Extract text from PDF bytes (for file uploads)."""
-        if HAS_FITZ:
-            return self._extract_with_fitz(pdf_bytes, filename)
-        elif HAS_PYPDF:
-            return self._extract_with_pypdf(pdf_bytes, filename)
+def _join_lines(lines: List[str]) -> str:
+    """Join wrapped lines of one paragraph, re-joining "exam-" + "ple"."""
+    text = lines[0]
+    for line in lines[1:]:
+        if text.endswith("-") and line[:1].islower():
+            text = text[:-1] + line
         else:
-            raise ImportError("No PDF library available. Install pypdf or PyMuPDF.")
-
-    def _extract_with_pypdf(self, pdf_bytes: bytes, filename: str = "") -> Dict:
-        """Extract text using pypdf (pure Python, works on all platforms)."""
-        import io
-        reader = PdfReader(io.BytesIO(pdf_bytes))
+            text = f"{text} {line}"
+    return text
 
-        full_text = ""
-        metadata = {
-            "total_pages": len(reader.pages),
-            "title": filename,
-            "author": "",
-        }
-
-        if reader.metadata:
-            metadata["title"] = reader.metadata.get("/Title", "") or filename
-            metadata["author"] = reader.metadata.get("/Author", "") or ""
 
-        for page_num, page in enumerate(reader.pages, 1):
-            text = page.extract_text() or ""
-            full_text += f"\n\n[Page {page_num}]\n{text}"
+def _open_stream(source: PdfSource) -> BinaryIO:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return open(source, "rb")
 
-        return {
-            "text": self.clean_text(full_text),
-            "metadata": metadata,
-        }
 
-    def _extract_with_fitz(self, pdf_bytes: bytes, filename: str = "") -> Dict:
-        """Extract text using PyMuPDF (faster, better quality)."""
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-        full_text = ""
-        metadata = {
-            "total_pages": len(doc),
-            "title": doc.metadata.get("title", "") or filename,
-            "author": doc.metadata.get("author", "") or "",
-        }
+class DocumentProcessor:
+    """Extracts text from PDFs and splits into semantically meaningful chunks."""
 
-        for page_num, page in enumerate(doc, 1):
-            text = page.get_text()
-            full_text += f"\n\n[Page {page_num}]\n{text}"
+    def __init__(
+        self,
+        extract_workers: int = 1,
+        parallel_min_pages: int = 32,
+        max_tokens: int = 256,
+        overlap_tokens: int = 40,
+    ):
+        # Token limits of the streaming iter_chunks
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        # >1 extracts documents of at least parallel_min_pages pages across processes
+        self.extract_workers = extract_workers
+        self.parallel_min_pages = parallel_min_pages
+
+    # ─── Streaming extraction ───
+
+    def extract_metadata(self, source: PdfSource, filename: str = "") -> Dict:
+        """Page count, title and author without extracting any page text."""
+        if HAS_FITZ:
+            doc = self._open_fitz(source)
+            try:
+                return {
+                    "total_pages": len(doc),
+                    "title": doc.metadata.get("title", "") or filename,
+                    "author": doc.metadata.get("author", "") or "",
+                }
+            finally:
+                doc.close()
+        elif HAS_PYPDF:
+            with _open_stream(source) as stream:
+                reader = PdfReader(stream)
+                metadata = {"total_pages": len(reader.pages), "title": filename, "author": ""}
+                if reader.metadata:
+                    metadata["title"] = reader.metadata.get("/Title", "") or filename
+                    metadata["author"] = reader.metadata.get("/Author", "") or ""
+                return metadata
+        else:
+            raise ImportError("No PDF library available. Install pypdf or PyMuPDF.")
 
-        doc.close()
+    def iter_pages(
+        self, source: PdfSource, total_pages: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """Yield ``(page_num, raw_text)`` one page at a time (1-based page numbers).
+
+        Large documents go through the process pool in
+        ``services.parallel_extraction`` when ``extract_workers > 1``.
+        """
+        if self.extract_workers > 1:
+            if total_pages is None:
+                total_pages = self.extract_metadata(source)["total_pages"]
+            if total_pages >= self.parallel_min_pages:
+                from services.parallel_extraction import iter_pages_parallel
+                yield from iter_pages_parallel(source, total_pages, self.extract_workers)
+                return
+        if HAS_FITZ:
+            yield from self._iter_pages_fitz(source)
+        elif HAS_PYPDF:
+            yield from self._iter_pages_pypdf(source)
+        else:
+            raise ImportError("No PDF library available. Install pypdf or PyMuPDF.")
 
-        return {
-            "text": self.clean_text(full_text),
-            "metadata": metadata,
-        }
+    @staticmethod
+    def _open_fitz(source: PdfSource):
+        if isinstance(source, str):
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype="pdf")
+
+    def _iter_pages_fitz(self, source: PdfSource) -> Iterator[Tuple[int, str]]:
+        """PyMuPDF (faster, better quality)."""
+        doc = self._open_fitz(source)
+        try:
+            for page_num, page in enumerate(doc, 1):
+                yield page_num, page.get_text()
+        finally:
+            doc.close()
+
+    def _iter_pages_pypdf(self, source: PdfSource) -> Iterator[Tuple[int, str]]:
+        """pypdf (pure Python, works on all platforms); objects are parsed lazily per page."""
+        with _open_stream(source) as stream:
+            reader = PdfReader(stream)
+            for page_num, page in enumerate(reader.pages, 1):
+                yield page_num, page.extract_text() or ""
 
     @staticmethod
-    def clean_text(text: str) -> str:
-        """Remove noise from extracted text."""
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"\[Page \d+\]\s*\d+", "", text)
-        text = text.replace("\x00", "")
-        return text.strip()
-
-    def chunk_text(self, text: str, metadata: Optional[Dict] = None) -> List[Dict]:
-        """Split text into overlapping chunks respecting paragraph boundaries."""
-        paragraphs = re.split(r"\n{2,}", text)
-
-        chunks: List[Dict] = []
-        current_chunk = ""
-        chunk_index = 0
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
+    def page_paragraphs(text: str) -> List[str]:
+        """Clean one page into paragraphs, keeping its structure.
+
+        Blank lines and bullet/numbered items start a new paragraph; wrapped
+        lines are joined (re-joining words hyphenated across a line break),
+        and a leading printed page number is dropped.
+        """
+        paragraphs: List[str] = []
+        for block in _PARAGRAPH_BREAK.split(text.replace("\x00", "")):
+            lines: List[str] = []
+            for line in block.split("\n"):
+                line = re.sub(r"\s+", " ", line).strip()
+                if not line:
+                    continue
+                if lines and _LIST_ITEM.match(line):
+                    paragraphs.append(_join_lines(lines))
+                    lines = []
+                lines.append(line)
+            if lines:
+                paragraphs.append(_join_lines(lines))
+        if paragraphs and paragraphs[0].isdigit():
+            paragraphs.pop(0)
+        return paragraphs
+
+    def _units(self, raw_page: str) -> Iterator[Tuple[str, str]]:
+        """``(text, separator)`` pieces of a page: whole paragraphs when they fit in a
+        chunk, otherwise their sentences (and word runs for run-on sentences)."""
+        for paragraph in self.page_paragraphs(raw_page):
+            if estimate_tokens(paragraph) <= self.max_tokens:
+                yield paragraph, "\n\n"
                 continue
+            separator = "\n\n"
+            for sentence in _SENTENCE_END.split(paragraph):
+                max_chars = self.max_tokens * CHARS_PER_TOKEN
+                while len(sentence) > max_chars:
+                    cut = sentence.rfind(" ", 0, max_chars)
+                    if cut <= 0:
+                        cut = max_chars
+                    yield sentence[:cut], separator
+                    separator = " "
+                    sentence = sentence[cut:].lstrip()
+                if sentence:
+                    yield sentence, separator
+                    separator = " "
+
+    def _make_chunk(self, parts: List[Tuple[str, str, int, int]], index: int, metadata: Dict) -> Dict:
+        text = parts[0][0] + "".join(sep + piece for piece, sep, _, _ in parts[1:])
+        pages = [page for _, _, page, _ in parts]
+        return {
+            "text": text,
+            "index": index,
+            "metadata": {
+                **metadata,
+                "page_start": min(pages),
+                "page_end": max(pages),
+                "token_count": estimate_tokens(text),
+            },
+        }
 
-            if len(current_chunk) + len(para) > self.chunk_size and current_chunk:
-                chunks.append({
-                    "text": current_chunk.strip(),
-                    "index": chunk_index,
-                    "metadata": metadata or {},
-                })
-                chunk_index += 1
-
-                overlap_words = current_chunk.split()[-self.chunk_overlap:]
-                current_chunk = " ".join(overlap_words) + " " + para
-            else:
-                current_chunk += " " + para if current_chunk else para
-
-        if current_chunk.strip():
-            chunks.append({
-                "text": current_chunk.strip(),
-                "index": chunk_index,
-                "metadata": metadata or {},
-            })
-
-        return chunks
+    def iter_chunks(
+        self, pages: Iterable[Tuple[int, str]], metadata: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """One-pass, structure-preserving chunker over ``iter_pages`` output.
+
+        Packs whole paragraphs (falling back to sentences) into chunks of at
+        most ``max_tokens`` estimated tokens, carries up to ``overlap_tokens``
+        of trailing paragraphs/sentences into the next chunk, and records
+        ``page_start``/``page_end`` in each chunk's metadata. Only the chunk
+        being built is held in memory.
+        """
+        metadata = metadata or {}
+        parts: List[Tuple[str, str, int, int]] = []  # (text, separator, page, tokens)
+        tokens = 0
+        new_tokens = 0  # tokens not carried over as overlap
+        index = 0
+        for page_num, raw in pages:
+            for piece, separator in self._units(raw):
+                piece_tokens = estimate_tokens(piece + separator)  # counts the joiner too
+                if new_tokens and tokens + piece_tokens > self.max_tokens:
+                    yield self._make_chunk(parts, index, metadata)
+                    index += 1
+                    parts = self._overlap(parts)
+                    tokens = sum(t for _, _, _, t in parts)
+                    new_tokens = 0
+                if not new_tokens and tokens + piece_tokens > self.max_tokens:
+                    parts, tokens = [], 0  # overlap would push this chunk over the limit
+                parts.append((piece, separator, page_num, piece_tokens))
+                tokens += piece_tokens
+                new_tokens += piece_tokens
+        if new_tokens:
+            yield self._make_chunk(parts, index, metadata)
+
+    def _overlap(self, parts: List[Tuple[str, str, int, int]]) -> List[Tuple[str, str, int, int]]:
+        """Trailing whole pieces of a finished chunk that fit in ``overlap_tokens``."""
+        kept: List[Tuple[str, str, int, int]] = []
+        budget = self.overlap_tokens
+        for part in reversed(parts):
+            if part[3] > budget:
+                break
+            kept.insert(0, part)
+            budget -= part[3]
+        return kept
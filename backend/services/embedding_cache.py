@@ -0,0 +1,278 @@
+"""Embedding Cache — query-embedding LRU/TTL cache and content-hash chunk embedding store."""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config.rag_config import EMBEDDING_CACHE_CONFIG
+from config.settings import EMBEDDING_CACHE_PATH, CHUNK_EMBEDDING_CACHE_PATH
+from services.vector_codec import as_float32
+
+
+def _pack(embedding: np.ndarray) -> bytes:
+    return as_float32(embedding).tobytes()
+
+
+def _unpack(blob: bytes) -> np.ndarray:
+    # Read-only view over the blob; callers never modify embeddings in place
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class _SqliteTier:
+    """Tiny key → float32 blob store that survives restarts."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return _unpack(row[0]), row[1]
+
+    def put(self, key: str, embedding: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
+                (key, _pack(embedding), created_at),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+            found.update((key, _unpack(blob)) for key, blob in rows)
+        return found
+
+    def touch_many(self, keys: List[str], now: float) -> None:
+        """Mark rows as used, so ``prune`` evicts the least recently used first."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE embeddings SET created_at = ? WHERE key = ?", [(now, key) for key in keys]
+            )
+            self._conn.commit()
+
+    def prune(self, max_rows: int, older_than: float) -> int:
+        """Delete rows last written or touched before ``older_than``, then the oldest beyond ``max_rows``."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM embeddings WHERE created_at < ?", (older_than,)).rowcount
+            excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - max_rows
+            if excess > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN"
+                    " (SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]], created_at: float) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
+                [(key, _pack(embedding), created_at) for key, embedding in items],
+            )
+            self._conn.commit()
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache of query embeddings with TTL expiry and hit/miss counters.
+
+    Keys combine normalized query text, embedding model and task type, so
+    "What is BFS?" and "what is  bfs" share one entry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        ttl_seconds: float = 86400.0,
+        disk_path: str = "",
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SqliteTier(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls) -> "QueryEmbeddingCache":
+        return cls(
+            max_entries=EMBEDDING_CACHE_CONFIG["max_entries"],
+            ttl_seconds=EMBEDDING_CACHE_CONFIG["ttl_seconds"],
+            disk_path=EMBEDDING_CACHE_PATH,
+        )
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = re.sub(r"\s+", " ", text.strip().lower())
+        return text.rstrip("?!. ")
+
+    def make_key(self, text: str, model: str, task_type: str) -> str:
+        raw = f"{model}|{task_type}|{self.normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def aget(self, key: str) -> Optional[np.ndarray]:
+        """Memory hits are served inline; the SQLite tier is read in a thread."""
+        now = time.time()
+        embedding = self._get_memory(key, now)
+        if embedding is None and self._disk is not None:
+            embedding = await asyncio.to_thread(self._get_disk, key, now)
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+        return embedding
+
+    async def aput(self, key: str, embedding: np.ndarray) -> None:
+        created_at = time.time()
+        self._remember(key, embedding, created_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, key, embedding, created_at)
+
+    def _get_memory(self, key: str, now: float) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[np.ndarray]:
+        stored = self._disk.get(key)
+        if stored is not None:
+            embedding, created_at = stored
+            if now - created_at <= self.ttl_seconds:
+                self._remember(key, embedding, created_at)
+                with self._lock:
+                    self.disk_hits += 1
+                return embedding
+            self._disk.delete(key)
+        return None
+
+    def _remember(self, key: str, embedding: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (embedding, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_tier": self._disk is not None,
+            }
+
+
+class ChunkEmbeddingCache:
+    """Persistent content-addressed store of document chunk embeddings.
+
+    Keys hash the exact chunk text with model and task type, so a re-uploaded
+    or shared document reuses every unchanged chunk's embedding. Embeddings
+    are deterministic for a given key; rows are evicted only to bound the
+    store: least recently used beyond ``max_rows``, or unused for ``ttl_seconds``.
+    """
+
+    def __init__(self, path: str = "", max_rows: int = 200_000, ttl_seconds: float = 90 * 24 * 3600.0):
+        self._disk = _SqliteTier(path) if path else None
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls) -> "ChunkEmbeddingCache":
+        return cls(
+            CHUNK_EMBEDDING_CACHE_PATH,
+            max_rows=EMBEDDING_CACHE_CONFIG["chunk_max_rows"],
+            ttl_seconds=EMBEDDING_CACHE_CONFIG["chunk_ttl_seconds"],
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._disk is not None
+
+    @staticmethod
+    def make_key(text: str, model: str, task_type: str) -> str:
+        raw = f"{model}|{task_type}|{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = self._disk.get_many(keys) if self._disk is not None else {}
+        if found:
+            self._disk.touch_many(list(found), time.time())
+        with self._lock:
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        if self._disk is not None and items:
+            now = time.time()
+            self._disk.put_many(items, now)
+            removed = self._disk.prune(self.max_rows, now - self.ttl_seconds)
+            with self._lock:
+                self.evictions += removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "max_rows": self.max_rows,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,53 +1,187 @@
 """Embedding Service — Google Gemini embedding generation."""
 import google.generativeai as genai
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter
 import asyncio
+import time
 
-from config.settings import GEMINI_API_KEY
+import numpy as np
+
+from services.gemini_client import configure_gemini
+from services.rate_limiter import get_limiter, is_overload
 from config.rag_config import EMBEDDING_CONFIG
+from services.embedding_cache import ChunkEmbeddingCache, QueryEmbeddingCache
+from services.vector_codec import as_float32
 
 
 class EmbeddingService:
-    """Generate vector embeddings using Google Gemini Embedding API."""
+    """Generate vector embeddings using Google Gemini Embedding API.
+
+    Every embedding is returned as a 1-D ``float32`` NumPy array.
+    """
 
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
+    def __init__(
+        self,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        chunk_cache: Optional[ChunkEmbeddingCache] = None,
+    ):
+        configure_gemini()
         self.model = EMBEDDING_CONFIG["model"]
+        self.query_cache = query_cache or QueryEmbeddingCache.from_config()
+        self.chunk_cache = chunk_cache or ChunkEmbeddingCache.from_config()
+        self.limiter = get_limiter("embedding")
 
-    def generate_embedding(
+    async def agenerate_embedding(
         self, text: str, task_type: str = "retrieval_document"
-    ) -> List[float]:
-        """Generate embedding for a single text chunk."""
-        result = genai.embed_content(
-            model=self.model,
-            content=text,
-            task_type=task_type,
-        )
-        return result["embedding"]
-
-    def generate_embeddings_batch(
+    ) -> np.ndarray:
+        """Embed a single text without blocking the event loop."""
+        async with self.limiter.aslot():
+            result = await genai.embed_content_async(
+                model=self.model,
+                content=text,
+                task_type=task_type,
+            )
+        return as_float32(result["embedding"])
+
+    @staticmethod
+    def plan_batches(
+        texts: List[str],
+        max_items: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """Split ``texts`` into [start, end) ranges bounded by item count and total characters."""
+        max_items = max_items or EMBEDDING_CONFIG["batch_max_items"]
+        max_chars = max_chars or EMBEDDING_CONFIG["batch_max_chars"]
+        batches = []
+        start, chars = 0, 0
+        for i, text in enumerate(texts):
+            if i > start and (i - start >= max_items or chars + len(text) > max_chars):
+                batches.append((start, i))
+                start, chars = i, 0
+            chars += len(text)
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _embed_many(self, texts: List[str], task_type: str) -> List[np.ndarray]:
+        """One batchEmbedContents round trip for several texts."""
+        with self.limiter.slot():
+            result = genai.embed_content(
+                model=self.model,
+                content=texts,
+                task_type=task_type,
+            )
+        # One (n, dim) float32 matrix; rows are views into it
+        return list(np.asarray(result["embedding"], dtype=np.float32))
+
+    def generate_embeddings_batch_with_stats(
         self,
         texts: List[str],
         task_type: str = "retrieval_document",
-        batch_size: int = 50,
-    ) -> List[List[float]]:
-        """Generate embeddings for multiple texts in batches."""
-        embeddings: List[List[float]] = []
+        max_items: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> Tuple[List[np.ndarray], Dict]:
+        """Embed ``texts`` with multi-input calls; returns (embeddings, throughput stats).
+
+        Texts already in the chunk cache (same text, model and task type) and
+        repeats within ``texts`` are not sent to Gemini; only the remaining
+        unique texts are batched. Each sub-batch is retried on its own, so a transient failure only
+        repeats that sub-batch, never the ones already embedded. Pacing comes
+        from the shared embedding limiter: a 429/503 shrinks its concurrency
+        window and pauses new calls, so retries wait there instead of sleeping.
+
+        ``on_progress`` is called with the number of ``texts`` that have an
+        embedding so far (cache hits first, then after every batch).
+        """
+        max_retries = EMBEDDING_CONFIG["batch_max_retries"]
+        started = time.perf_counter()
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
+        keys = [self.chunk_cache.make_key(t, self.model, task_type) for t in texts]
+        known = self.chunk_cache.get_many(keys)
+        cache_hits = sum(1 for key in keys if key in known)
+        # Unique uncached texts, in first-seen order
+        pending = {key: text for key, text in zip(keys, texts) if key not in known}
+        pending_keys = list(pending)
+        pending_texts = list(pending.values())
+        key_counts = Counter(keys)
+        done = cache_hits
+        if on_progress:
+            on_progress(done)
 
-            for text in batch:
-                emb = self.generate_embedding(text, task_type)
-                embeddings.append(emb)
+        batches = self.plan_batches(pending_texts, max_items, max_chars)
+        retries = 0
+        for start, end in batches:
+            for attempt in range(max_retries + 1):
+                try:
+                    vectors = self._embed_many(pending_texts[start:end], task_type)
+                    break
+                except Exception as e:
+                    if attempt == max_retries:
+                        raise
+                    retries += 1
+                    if not is_overload(e):
+                        time.sleep(2 ** attempt)
+            fresh = list(zip(pending_keys[start:end], vectors))
+            # Persist per batch so a failed upload keeps the work already paid for
+            self.chunk_cache.put_many(fresh)
+            known.update(fresh)
+            done += sum(key_counts[key] for key, _ in fresh)
+            if on_progress:
+                on_progress(done)
 
-            # Small delay between batches for rate limiting
-            if i + batch_size < len(texts):
-                import time
-                time.sleep(0.5)
+        embeddings = [known[key] for key in keys]
+        elapsed = time.perf_counter() - started
+        stats = {
+            "chunks": len(texts),
+            "cache_hits": cache_hits,
+            "embedded": len(pending_texts),
+            "batches": len(batches),
+            "retries": retries,
+            "seconds": round(elapsed, 3),
+            "chunks_per_second": round(len(texts) / elapsed, 2) if elapsed else 0.0,
+        }
+        return embeddings, stats
+
+    def iter_embedded_batches(
+        self,
+        chunks: Iterable[Dict],
+        task_type: str = "retrieval_document",
+        max_items: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ) -> Iterator[Tuple[List[Dict], List[np.ndarray], Dict]]:
+        """Embed a stream of ``{"text": ...}`` chunks batch by batch.
 
-        return embeddings
+        Chunks are buffered only until a batch fills (same limits as
+        ``plan_batches``), then embedded and yielded as
+        ``(chunks, embeddings, stats)`` so callers can store them while the
+        source is still being read.
+        """
+        max_items = max_items or EMBEDDING_CONFIG["batch_max_items"]
+        max_chars = max_chars or EMBEDDING_CONFIG["batch_max_chars"]
+        batch: List[Dict] = []
+        chars = 0
+        for chunk in chunks:
+            if batch and (len(batch) >= max_items or chars + len(chunk["text"]) > max_chars):
+                embeddings, stats = self.generate_embeddings_batch_with_stats(
+                    [c["text"] for c in batch], task_type, max_items, max_chars
+                )
+                yield batch, embeddings, stats
+                batch, chars = [], 0
+            batch.append(chunk)
+            chars += len(chunk["text"])
+        if batch:
+            embeddings, stats = self.generate_embeddings_batch_with_stats(
+                [c["text"] for c in batch], task_type, max_items, max_chars
+            )
+            yield batch, embeddings, stats
 
-    def embed_query(self, query: str) -> List[float]:
-        """Generate embedding for a search query."""
-        return self.generate_embedding(query, task_type="retrieval_query")
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """Embed a search query (served from cache when possible)."""
+        task_type = EMBEDDING_CONFIG["task_type_query"]
+        key = self.query_cache.make_key(query, self.model, task_type)
+        embedding = await self.query_cache.aget(key)
+        if embedding is None:
+            embedding = await self.agenerate_embedding(query, task_type=task_type)
+            await self.query_cache.aput(key, embedding)
+        return embedding
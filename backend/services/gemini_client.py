@@ -0,0 +1,29 @@
+"""Gemini Client — one-time SDK configuration and shared model handles."""
+from typing import Dict
+
+import google.generativeai as genai
+
+from config.settings import GEMINI_API_KEY
+
+_configured = False
+_models: Dict[str, genai.GenerativeModel] = {}
+
+
+def configure_gemini() -> None:
+    """Configure the SDK once per process.
+
+    ``genai.configure`` resets the SDK's client cache, so calling it per
+    request throws away the underlying gRPC channels.
+    """
+    global _configured
+    if not _configured:
+        genai.configure(api_key=GEMINI_API_KEY)
+        _configured = True
+
+
+def get_model(model_name: str) -> genai.GenerativeModel:
+    """Return a shared GenerativeModel for the given model name."""
+    configure_gemini()
+    if model_name not in _models:
+        _models[model_name] = genai.GenerativeModel(model_name)
+    return _models[model_name]
@@ -0,0 +1,318 @@
+"""Ingestion Service — PDF → chunks → embeddings → knowledge_base pipeline."""
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import hashlib
+import os
+import time
+import uuid
+
+from services.document_processor import DocumentProcessor, PdfSource
+from services.embedding_service import EmbeddingService
+from services.vector_store import VectorStore
+from services.local_index import LocalVectorIndex
+from services.response_cache import SemanticResponseCache
+from services.near_duplicates import NearDuplicateIndex
+from services.document_catalog import DocumentCatalog
+from services.question_bank import QuestionBank
+from config.rag_config import INGESTION_CONFIG, RAG_SETTINGS
+
+# stage → (progress at stage start, progress at stage end). Embedding and
+# storing interleave batch by batch, so both advance with the pages read.
+STAGE_PROGRESS = {
+    "extracting": (0.0, 0.02),
+    "embedding": (0.02, 0.98),
+    "storing": (0.02, 0.98),
+    "indexing": (0.98, 1.0),
+}
+
+ProgressCallback = Callable[[str, float, Dict], None]
+
+_BATCH_STAT_KEYS = ("chunks", "cache_hits", "embedded", "batches", "retries")
+_WRITE_STAT_KEYS = ("rows", "batches", "bytes", "retries", "seconds")
+
+# append: add the document's chunks; upsert: replace an existing document by chunk diff
+INGEST_MODES = ("append", "upsert")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestionError(ValueError):
+    """The document yielded nothing to index; the job fails with this message."""
+
+
+class IngestionService:
+    """Runs the upload pipeline and reports stage progress to an optional callback.
+
+    The callback receives ``(stage, progress, counters)`` where ``progress``
+    is 0..1 over the whole pipeline and ``counters`` holds
+    ``chunks_total`` / ``chunks_embedded`` / ``chunks_stored``.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        vector_store: VectorStore,
+        local_index: Optional[LocalVectorIndex] = None,
+        response_cache: Optional[SemanticResponseCache] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        catalog: Optional[DocumentCatalog] = None,
+        question_bank: Optional[QuestionBank] = None,
+    ):
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.local_index = local_index
+        self.response_cache = response_cache
+        self.near_duplicates = near_duplicates
+        self.catalog = catalog
+        self.question_bank = question_bank
+
+    def ingest(
+        self,
+        source: PdfSource,
+        filename: str,
+        subject_id: str,
+        job_id: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        mode: str = "append",
+    ) -> Dict:
+        """Extract, chunk, embed and store one PDF (bytes or path); returns the upload summary.
+
+        Pages stream through cleaning and chunking into embedding batches, and
+        each batch is stored as soon as it is embedded, so memory stays flat
+        and embedding starts before extraction finishes.
+
+        ``mode="upsert"`` replaces an existing ``filename`` in the subject by
+        chunk diff: chunks whose content hash matches an existing row keep
+        that row (re-indexed if their position or pages moved), only new or
+        changed chunks are embedded and inserted, and rows no longer present
+        are deleted after every insert succeeded — the old version stays
+        searchable throughout.
+
+        Every stored row is tagged ``metadata.ingestion_job`` (``job_id`` or a
+        fresh run id) and ``metadata.ingestion_run`` (this attempt). In
+        append mode, rows from an earlier interrupted run of the same job are
+        removed before the first insert; a failed attempt removes the rows it
+        inserted, so a document is never half-ingested or duplicated.
+
+        With a ``near_duplicates`` index, chunks that near-duplicate text
+        already in the subject (or earlier in this document) are skipped or
+        linked to their original (``DEDUP_CONFIG["action"]``); the result
+        reports ``chunks_duplicate`` and ``dedup_ratio``.
+        """
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingestion mode: {mode}")
+        run_id = uuid.uuid4().hex
+        job_tag = job_id or run_id
+        counters = {"chunks_total": 0, "chunks_embedded": 0, "chunks_stored": 0}
+        diff = {"chunks_unchanged": 0, "chunks_deleted": 0, "chunks_reindexed": 0}
+        duplicates = 0
+        prior_removed = 0  # rows of an interrupted earlier run of this job
+        changed_terms: Set[str] = set()  # words of added/removed chunks, for the question bank
+        pages_read = 0
+        text_chars = 0
+
+        def report(stage: str, fraction: float = 0.0) -> None:
+            if progress:
+                start, end = STAGE_PROGRESS[stage]
+                progress(stage, round(start + (end - start) * fraction, 4), dict(counters))
+
+        report("extracting")
+        processor = DocumentProcessor(
+            extract_workers=min(INGESTION_CONFIG["extract_workers"], os.cpu_count() or 1),
+            parallel_min_pages=INGESTION_CONFIG["parallel_min_pages"],
+            max_tokens=RAG_SETTINGS["chunk_max_tokens"],
+            overlap_tokens=RAG_SETTINGS["chunk_overlap_tokens"],
+        )
+        metadata = processor.extract_metadata(source, filename)
+        total_pages = max(metadata.get("total_pages", 0), 1)
+
+        # Upsert: content hash → existing rows with that content
+        existing: Dict[str, List[Dict]] = {}
+        if mode == "upsert":
+            for row in self.vector_store.fetch_document_chunks(subject_id, filename):
+                row_metadata = row.get("metadata") or {}
+                key = row_metadata.get("content_hash") or content_hash(row.get("content") or "")
+                existing.setdefault(key, []).append(row)
+        moved: List[Tuple[Dict, Dict]] = []  # (existing row, new chunk)
+
+        def replaced(ref: Dict) -> bool:
+            """Rows this run is about to replace never count as originals."""
+            if ref.get("ingestion_run") == run_id:
+                return False
+            return ref.get("ingestion_job") == job_tag or (
+                mode == "upsert" and ref.get("source_document") == filename
+            )
+
+        def pages() -> Iterator[Tuple[int, str]]:
+            nonlocal pages_read
+            for page in processor.iter_pages(source, metadata["total_pages"]):
+                pages_read = page[0]
+                yield page
+
+        def changed_chunks() -> Iterator[Dict]:
+            nonlocal text_chars, duplicates
+            for chunk in processor.iter_chunks(pages(), metadata):
+                counters["chunks_total"] += 1
+                text_chars += len(chunk["text"])
+                key = content_hash(chunk["text"])
+                matches = existing.get(key)
+                if matches:
+                    row = matches.pop()
+                    diff["chunks_unchanged"] += 1
+                    if self._needs_reindex(row, chunk):
+                        moved.append((row, chunk))
+                    continue
+                tagged = {
+                    **chunk,
+                    "metadata": {
+                        **chunk["metadata"],
+                        "content_hash": key,
+                        "ingestion_job": job_tag,
+                        "ingestion_run": run_id,
+                    },
+                }
+                if self.near_duplicates is not None:
+                    tagged, is_duplicate = self.near_duplicates.screen(subject_id, tagged, filename, replaced)
+                    duplicates += is_duplicate
+                    if tagged is None:
+                        continue
+                if self.question_bank is not None:
+                    changed_terms.update(QuestionBank.terms(chunk["text"]))
+                yield tagged
+
+        embedding_stats = dict.fromkeys(_BATCH_STAT_KEYS, 0)
+        write_stats = dict.fromkeys(_WRITE_STAT_KEYS, 0)
+        wrote_rows = False
+        started = time.perf_counter()
+        try:
+            for batch, embeddings, stats in self.embedding_service.iter_embedded_batches(changed_chunks()):
+                for key in _BATCH_STAT_KEYS:
+                    embedding_stats[key] += stats[key]
+                counters["chunks_embedded"] += len(batch)
+                if text_chars < 50:
+                    raise IngestionError("Could not extract meaningful text from the PDF")
+
+                report("storing", pages_read / total_pages)
+                if not wrote_rows:
+                    if job_id and mode == "append":
+                        prior_removed = self.vector_store.delete_tagged_chunks(subject_id, "ingestion_job", job_id)
+                    wrote_rows = True
+                written = self.vector_store.store_chunks_with_embeddings(
+                    chunks=batch,
+                    embeddings=embeddings,
+                    subject_id=subject_id,
+                    source_document=filename,
+                )
+                counters["chunks_stored"] += written["rows"]
+                for key in _WRITE_STAT_KEYS:
+                    write_stats[key] += written[key]
+                report("embedding", pages_read / total_pages)
+
+            if not counters["chunks_total"] or text_chars < 50:
+                raise IngestionError("Could not extract meaningful text from the PDF")
+            if not wrote_rows and job_id and mode == "append":
+                # Every chunk was a duplicate: still clear an interrupted earlier run
+                prior_removed = self.vector_store.delete_tagged_chunks(subject_id, "ingestion_job", job_id)
+        except Exception:
+            if self.near_duplicates is not None:
+                # Signatures added by this run point at rows that will not exist
+                self.near_duplicates.invalidate(subject_id)
+            if wrote_rows:
+                try:
+                    self.vector_store.delete_tagged_chunks(subject_id, "ingestion_run", run_id)
+                except Exception as e:
+                    print(f"[IngestionService] cleanup error for {run_id}: {e}")
+            if self.local_index is not None and (wrote_rows or prior_removed):
+                # A refresh may already hold rows that were just deleted
+                self.local_index.invalidate(subject_id)
+            raise
+
+        # Upsert: drop rows of the old version, then fix positions of kept rows
+        report("indexing")
+        stale_ids = [row["id"] for rows in existing.values() for row in rows]
+        if self.question_bank is not None:
+            for rows in existing.values():
+                for row in rows:
+                    changed_terms.update(QuestionBank.terms(row.get("content") or ""))
+        if stale_ids:
+            diff["chunks_deleted"] = self.vector_store.delete_chunks(stale_ids)
+        for row, chunk in moved:
+            self.vector_store.update_chunk(row["id"], {
+                "chunk_index": chunk["index"],
+                "metadata": {**(row.get("metadata") or {}), **self._position(chunk)},
+            })
+        diff["chunks_reindexed"] = len(moved)
+
+        if self.near_duplicates is not None and (stale_ids or prior_removed):
+            # Rows were removed: rebuild the subject's signatures from knowledge_base
+            self.near_duplicates.invalidate(subject_id)
+
+        # Make the new chunks visible to retrieval
+        if self.local_index is not None:
+            if stale_ids or moved or prior_removed:
+                # Removed/re-positioned rows: reload the subject from scratch
+                self.local_index.invalidate(subject_id)
+            else:
+                self.local_index.mark_stale(subject_id)
+        if self.response_cache is not None:
+            self.response_cache.invalidate_subject(subject_id)
+        if self.question_bank is not None:
+            # Only topics the added/removed chunks mention can have stale questions
+            self.question_bank.invalidate_topics(subject_id, changed_terms)
+        if self.catalog is not None:
+            try:
+                self.catalog.record_ingestion(
+                    subject_id,
+                    filename,
+                    rows_added=counters["chunks_stored"],
+                    # Upsert: the document now has exactly its kept + new rows
+                    rows_total=diff["chunks_unchanged"] + counters["chunks_stored"] if mode == "upsert" else None,
+                )
+            except Exception as e:
+                print(f"[IngestionService] catalog update error for {filename}: {e}")
+        report("indexing", 1.0)
+
+        elapsed = time.perf_counter() - started
+        embedding_stats["seconds"] = round(elapsed, 3)
+        embedding_stats["chunks_per_second"] = (
+            round(counters["chunks_total"] / elapsed, 2) if elapsed else 0.0
+        )
+        result = {
+            "status": "success",
+            "filename": filename,
+            "mode": mode,
+            "chunks_processed": counters["chunks_total"],
+            "pages": metadata.get("total_pages", 0),
+            "stored_records": counters["chunks_stored"],
+            "embedding_cache_hits": embedding_stats["cache_hits"],
+            "embedding_stats": embedding_stats,
+            "write_stats": {
+                **write_stats,
+                "seconds": round(write_stats["seconds"], 3),
+                "rows_per_second": (
+                    round(write_stats["rows"] / write_stats["seconds"], 1) if write_stats["seconds"] else 0.0
+                ),
+            },
+        }
+        if mode == "upsert":
+            result.update(diff)
+        if self.near_duplicates is not None:
+            result["chunks_duplicate"] = duplicates
+            result["dedup_ratio"] = (
+                round(duplicates / counters["chunks_total"], 4) if counters["chunks_total"] else 0.0
+            )
+        return result
+
+    @staticmethod
+    def _position(chunk: Dict) -> Dict:
+        return {
+            "page_start": chunk["metadata"].get("page_start"),
+            "page_end": chunk["metadata"].get("page_end"),
+        }
+
+    @classmethod
+    def _needs_reindex(cls, row: Dict, chunk: Dict) -> bool:
+        row_metadata = row.get("metadata") or {}
+        current = {key: row_metadata.get(key) for key in ("page_start", "page_end")}
+        return row.get("chunk_index") != chunk["index"] or current != cls._position(chunk)
@@ -0,0 +1,298 @@
+"""Ingestion Jobs — persistent upload queue with a background worker pool.
+
+Uploads are spooled to disk and recorded in SQLite, then a pool of asyncio
+workers runs ``IngestionService.ingest`` in threads. A running job records
+its owning pool and a heartbeat; a graceful shutdown hands it back to the
+queue, and a job whose owner stopped heartbeating (a crash) is re-queued by
+any pool sharing the database. Either way it resumes from the spooled PDF;
+the chunk embedding cache makes the repeated work cheap.
+"""
+from typing import Dict, List, Optional, Set
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from config.rag_config import INGESTION_CONFIG
+from config.settings import INGESTION_DB_PATH, INGESTION_SPOOL_DIR
+from services.ingestion import IngestionService
+
+JOB_FIELDS = (
+    "id", "subject_id", "filename", "mode", "status", "stage", "progress",
+    "chunks_total", "chunks_embedded", "chunks_stored",
+    "attempts", "error", "result", "created_at", "updated_at", "owner", "heartbeat_at",
+)
+
+
+class IngestionInterrupted(Exception):
+    """The pool is stopping; the job goes back to the queue and resumes on next start."""
+
+
+class IngestionJobStore:
+    """SQLite-backed job table plus a spool directory holding each job's PDF."""
+
+    def __init__(self, db_path: str, spool_dir: str):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_dir = spool_dir
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+            " id TEXT PRIMARY KEY, subject_id TEXT NOT NULL, filename TEXT NOT NULL,"
+            " status TEXT NOT NULL, stage TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0,"
+            " chunks_total INTEGER NOT NULL DEFAULT 0, chunks_embedded INTEGER NOT NULL DEFAULT 0,"
+            " chunks_stored INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT, result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL,"
+            " mode TEXT NOT NULL DEFAULT 'append')"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+        if "mode" not in columns:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN mode TEXT NOT NULL DEFAULT 'append'")
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN owner TEXT")
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN heartbeat_at REAL")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.pdf")
+
+    def create(self, subject_id: str, filename: str, pdf_bytes: bytes, mode: str = "append") -> str:
+        job_id = uuid.uuid4().hex
+        # Spool first: a job row never points at a missing file
+        tmp_path = self.spool_path(job_id) + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, self.spool_path(job_id))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs (id, subject_id, filename, mode, status, stage, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, subject_id, filename, mode, now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Mark a queued job running under ``owner``; False if another worker got it first."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', owner = ?, heartbeat_at = ?, updated_at = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (owner, now, now, job_id),
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def heartbeat(self, owner: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                (time.time(), owner),
+            )
+            self._conn.commit()
+
+    def release(self, job_id: str) -> None:
+        """Hand a job interrupted by a graceful shutdown back to the queue (not an attempt)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'queued', owner = NULL, heartbeat_at = NULL, updated_at = ?"
+                " WHERE id = ? AND status = 'running'",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def requeue_stale(self, stale_after_s: float) -> List[str]:
+        """Re-queue running jobs whose owner stopped heartbeating; each counts as an attempt."""
+        cutoff = time.time() - stale_after_s
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM ingestion_jobs WHERE status = 'running'"
+                " AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (cutoff,),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE ingestion_jobs SET status = 'queued', owner = NULL, heartbeat_at = NULL,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ? AND status = 'running'",
+                [(time.time(), row[0]) for row in rows],
+            )
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+    def recover(self, stale_after_s: float) -> List[str]:
+        """Re-queue crashed jobs and return every queued id, oldest first."""
+        self.requeue_stale(stale_after_s)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM ingestion_jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+class IngestionWorkerPool:
+    """Asyncio workers that pull job ids off a queue and run the pipeline in threads."""
+
+    def __init__(
+        self,
+        ingestion_service: IngestionService,
+        store: Optional[IngestionJobStore] = None,
+        workers: Optional[int] = None,
+    ):
+        self.ingestion_service = ingestion_service
+        self.store = store or IngestionJobStore(INGESTION_DB_PATH, INGESTION_SPOOL_DIR)
+        self.workers = workers or INGESTION_CONFIG["workers"]
+        self.max_attempts = INGESTION_CONFIG["max_attempts"]
+        self.heartbeat_s = INGESTION_CONFIG["heartbeat_s"]
+        self.stale_after_s = INGESTION_CONFIG["stale_after_s"]
+        # Identifies this pool's running jobs to other processes sharing the database
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Set by stop(); running pipelines check it between batches
+        self._stopping = threading.Event()
+        self._running: Set[asyncio.Future] = set()
+
+    async def start(self) -> None:
+        """Start the workers and resume anything left over from a previous run."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._stopping.clear()
+        for job_id in self.store.recover(self.stale_after_s):
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self) -> None:
+        """Stop taking new jobs. A job mid-run is handed back to the queue and resumes on next start.
+
+        Returns only once pipeline threads have reached their next batch
+        boundary and exited, so the shared HTTP clients can be closed safely.
+        """
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._running, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, subject_id: str, filename: str, pdf_bytes: bytes, mode: str = "append") -> str:
+        job_id = self.store.create(subject_id, filename, pdf_bytes, mode)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if self.store.claim(job_id, self.owner):
+                    run = asyncio.ensure_future(asyncio.to_thread(self._run, job_id))
+                    self._running.add(run)
+                    run.add_done_callback(self._running.discard)
+                    # Shielded: cancelling the worker must not orphan the thread (stop() joins it)
+                    await asyncio.shield(run)
+            except Exception as e:
+                print(f"[IngestionWorkerPool] worker error on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat(self) -> None:
+        """Keep this pool's jobs fresh and pick up jobs of pools that crashed."""
+        while True:
+            await asyncio.sleep(self.heartbeat_s)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.owner)
+                for job_id in await asyncio.to_thread(self.store.requeue_stale, self.stale_after_s):
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                print(f"[IngestionWorkerPool] heartbeat error: {e}")
+
+    def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        path = self.store.spool_path(job_id)
+
+        if job["attempts"] >= self.max_attempts:
+            self._finish(job_id, path, status="failed", error="Gave up after repeated interruptions")
+            return
+
+        def progress(stage: str, fraction: float, counters: Dict) -> None:
+            # Checked between batches; once indexing starts every row is written, so finish
+            if self._stopping.is_set() and stage != "indexing":
+                raise IngestionInterrupted(job_id)
+            self.store.update(job_id, stage=stage, progress=fraction, **counters)
+
+        try:
+            # The pipeline reads the spooled PDF page by page
+            result = self.ingestion_service.ingest(
+                path,
+                job["filename"],
+                job["subject_id"],
+                job_id=job_id,
+                progress=progress,
+                mode=job["mode"],
+            )
+        except IngestionInterrupted:
+            # Keep the spooled PDF; the job is queued again without using up an attempt
+            self.store.release(job_id)
+            return
+        except Exception as e:
+            self._finish(job_id, path, status="failed", error=str(e))
+            return
+        self._finish(job_id, path, status="succeeded", result=result)
+
+    def _finish(self, job_id: str, path: str, **fields) -> None:
+        if fields["status"] == "succeeded":
+            fields.update(stage="done", progress=1.0)
+        self.store.update(job_id, **fields)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def snapshot(self) -> Dict:
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "queued_in_memory": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": self.store.counts(),
+        }
@@ -0,0 +1,172 @@
+"""Intent Classifier — local keyword rules + nearest-centroid model over query embeddings.
+
+Replaces the per-query Gemini classification call in SocraticEngine. The LLM
+is only consulted when neither the rules nor the embedding model is confident,
+and its answers are fed back into the centroids.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import re
+import threading
+
+import numpy as np
+
+from config.rag_config import INTENT_CLASSIFIER_CONFIG
+from prompts.intent_examples import INTENT_EXAMPLES
+from services.vector_codec import as_float32
+
+# (pattern, weight) per intent label value. Matched against the lowercased query.
+INTENT_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "verification": [
+        (r"\b(is|are) (this|that|my|it|these)\b.*\b(correct|right|wrong|valid|ok)\b", 1.0),
+        (r"\b(am i|did i|have i)\b.*\b(right|correct|wrong)\b", 1.0),
+        (r"\b(check|verify|validate)\b.*\b(my|this|answer|solution)\b", 1.0),
+        (r"\bmy (answer|solution|approach|understanding|code)\b", 0.6),
+        (r"\b(is it true that|does that mean)\b", 0.6),
+    ],
+    "problem_solving": [
+        (r"\bhow (do|can|would|should) (i|we|you) (solve|compute|calculate|find|implement|apply)\b", 1.0),
+        (r"\b(solve|calculate|compute|derive|trace|simulate)\b", 0.7),
+        (r"\b(find the|apply .* to|step[- ]by[- ]step|work through)\b", 0.6),
+        (r"\b(given|for the (graph|tree|problem|following))\b", 0.4),
+    ],
+    "clarification": [
+        (r"^\s*why\b", 1.0),
+        (r"\bwhy (does|do|is|are|would|can't|cannot|not)\b", 0.9),
+        (r"\b(what do you mean|i don'?t (get|understand)|confused|unclear)\b", 0.9),
+        (r"\b(what'?s the difference|difference between|instead of)\b", 0.5),
+    ],
+    "conceptual_understanding": [
+        (r"^\s*(what|who) (is|are)\b", 0.9),
+        (r"\b(explain|define|definition of|describe|meaning of)\b", 0.8),
+        (r"\bhow does .* work\b", 0.8),
+        (r"\b(what are the (types|properties|components|advantages))\b", 0.6),
+    ],
+}
+
+_COMPILED_RULES = {
+    label: [(re.compile(p), w) for p, w in rules]
+    for label, rules in INTENT_RULES.items()
+}
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    na = float(np.linalg.norm(a))
+    nb = float(np.linalg.norm(b))
+    return float(np.dot(a, b)) / (na * nb) if na and nb else 0.0
+
+
+class IntentClassifier:
+    """Fast local intent classification with a confidence score.
+
+    ``classify`` returns ``(label, confidence, source)`` where ``source`` is
+    ``"rules"`` or ``"embedding"``. Callers fall back to the LLM when the
+    confidence is below ``confidence_threshold``.
+    """
+
+    def __init__(self, confidence_threshold: Optional[float] = None):
+        self.confidence_threshold = (
+            confidence_threshold
+            if confidence_threshold is not None
+            else INTENT_CLASSIFIER_CONFIG["confidence_threshold"]
+        )
+        self._lock = threading.Lock()
+        # label → (running sum vector, count)
+        self._centroids: Dict[str, Tuple[np.ndarray, int]] = {}
+        self._training: Optional[asyncio.Task] = None
+        self._trained = False
+        self.stats = {"rules": 0, "embedding": 0, "llm_fallback": 0, "learned": 0}
+
+    @property
+    def is_trained(self) -> bool:
+        return self._trained
+
+    # ─── Rules ───
+
+    @staticmethod
+    def rule_scores(query: str) -> Dict[str, float]:
+        text = query.lower()
+        scores = {}
+        for label, rules in _COMPILED_RULES.items():
+            score = sum(w for pattern, w in rules if pattern.search(text))
+            if score:
+                scores[label] = score
+        return scores
+
+    # ─── Embedding model (nearest centroid) ───
+
+    def learn(self, label: str, embedding: np.ndarray) -> None:
+        """Add one labelled query embedding to the label's centroid."""
+        vector = as_float32(embedding)
+        with self._lock:
+            total, count = self._centroids.get(label, (np.zeros_like(vector), 0))
+            self._centroids[label] = (total + vector, count + 1)
+
+    def embedding_scores(self, embedding: np.ndarray) -> Dict[str, float]:
+        with self._lock:
+            centroids = {label: total for label, (total, _) in self._centroids.items()}
+        vector = as_float32(embedding)
+        return {label: _cosine(vector, total) for label, total in centroids.items()}
+
+    async def atrain(self, embed: Callable[[str], Awaitable[np.ndarray]]) -> None:
+        """Fit centroids from the seed examples (embeddings come from the query cache)."""
+        try:
+            for label, examples in INTENT_EXAMPLES.items():
+                for example in examples:
+                    self.learn(label, await embed(example))
+            self._trained = True
+        except Exception as e:
+            print(f"[IntentClassifier] training error: {e}")
+            with self._lock:
+                self._centroids.clear()
+            self._training = None  # retry on a later request
+
+    def ensure_training(self, embed: Callable[[str], Awaitable[np.ndarray]]) -> None:
+        """Kick off background training once; classification keeps working meanwhile."""
+        if self._training is None:
+            self._training = asyncio.create_task(self.atrain(embed))
+
+    # ─── Combined decision ───
+
+    def classify(
+        self, query: str, embedding: Optional[np.ndarray] = None
+    ) -> Tuple[Optional[str], float, str]:
+        rules = self.rule_scores(query)
+        if rules:
+            ranked = sorted(rules.items(), key=lambda kv: kv[1], reverse=True)
+            best, best_score = ranked[0]
+            if len(ranked) == 1:
+                confidence = min(1.0, 0.5 + best_score / 2)
+            else:
+                # Competing rules: confidence shrinks with the runner-up's share
+                confidence = min(1.0, best_score) * (best_score - ranked[1][1]) / best_score
+            if confidence >= self.confidence_threshold:
+                return best, confidence, "rules"
+
+        if embedding is not None and self.is_trained:
+            sims = sorted(self.embedding_scores(embedding).items(), key=lambda kv: kv[1], reverse=True)
+            best, best_sim = sims[0]
+            runner_up = sims[1][1] if len(sims) > 1 else 0.0
+            # Margin between the two nearest centroids, scaled so ~0.05 cosine ≈ confident
+            confidence = min(1.0, max(0.0, (best_sim - runner_up) * 20))
+            if rules.get(best):
+                confidence = min(1.0, confidence + 0.2)
+            if confidence >= self.confidence_threshold:
+                return best, confidence, "embedding"
+
+        return None, 0.0, "none"
+
+    def record(self, source: str) -> None:
+        with self._lock:
+            self.stats[source] = self.stats.get(source, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            labels = {label: count for label, (_, count) in self._centroids.items()}
+        decided = stats["rules"] + stats["embedding"] + stats["llm_fallback"]
+        return {
+            **stats,
+            "local_rate": round((stats["rules"] + stats["embedding"]) / decided, 4) if decided else 0.0,
+            "centroid_examples": labels,
+        }
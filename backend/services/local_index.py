@@ -0,0 +1,261 @@
+"""Local Vector Index — in-process per-subject mirror of knowledge_base chunks.
+
+Each subject's chunks are loaded lazily into a normalized float32 NumPy matrix,
+so a top-k search is a single matrix-vector product instead of a
+match_embeddings RPC round trip, and into a BM25 inverted index that replaces
+the ilike scan for keyword search. Loads and refreshes run in the background;
+until a subject is ready, VectorStore keeps using the database.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from config.rag_config import LOCAL_INDEX_CONFIG
+from services.bm25_index import BM25Index
+from services.vector_codec import as_float32, parse_pgvector
+
+ROW_FIELDS = "id,course_id,title,content,chunk_index,source_document,metadata,created_at"
+
+
+def _headers() -> dict:
+    return {
+        "apikey": SUPABASE_ANON_KEY,
+        "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+class SubjectIndex:
+    """Chunk rows, unit-normalized embedding matrix and BM25 index for one subject."""
+
+    def __init__(self, subject_id: str):
+        self.subject_id = subject_id
+        self.rows: List[Dict] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.last_created_at: Optional[str] = None
+        self.loaded_at = 0.0
+        self.stale = False
+        self.bm25 = BM25Index()
+
+    def add(self, rows: List[Dict]) -> None:
+        """Append rows (with an ``embedding`` field), skipping ids already present."""
+        known = {str(r["id"]) for r in self.rows}
+        fresh = [r for r in rows if r.get("embedding") is not None and str(r["id"]) not in known]
+        if not fresh:
+            return
+        vectors = np.vstack([parse_pgvector(r.pop("embedding")) for r in fresh])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        self.matrix = vectors if not self.rows else np.vstack([self.matrix, vectors])
+        self.rows.extend(fresh)
+        self.bm25.add(fresh)
+        newest = max(r.get("created_at") or "" for r in fresh)
+        if newest and (self.last_created_at is None or newest > self.last_created_at):
+            self.last_created_at = newest
+
+    def remove_document(self, source_document: str) -> int:
+        keep = [i for i, r in enumerate(self.rows) if r.get("source_document") != source_document]
+        removed = len(self.rows) - len(keep)
+        if removed:
+            self.bm25.remove(
+                r["id"] for r in self.rows if r.get("source_document") == source_document
+            )
+            self.rows = [self.rows[i] for i in keep]
+            self.matrix = self.matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+        return removed
+
+    def search(self, query_embedding: np.ndarray, top_k: int, threshold: float) -> List[Dict]:
+        if not self.rows:
+            return []
+        query = as_float32(query_embedding)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        sims = self.matrix @ query
+        k = min(top_k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [
+            {**self.rows[i], "similarity": float(sims[i])}
+            for i in top
+            if sims[i] > threshold
+        ]
+
+    def keyword_search(self, query: str, limit: int) -> List[Dict]:
+        return [
+            {**row, "keyword_score": score}
+            for row, score in self.bm25.search(query, limit)
+        ]
+
+
+class LocalVectorIndex:
+    """Lazily loaded, incrementally refreshed per-subject vector indexes."""
+
+    def __init__(self, ahttp: Optional[httpx.AsyncClient] = None):
+        self.rest_url = f"{SUPABASE_URL}/rest/v1"
+        self.ahttp = ahttp
+        self.enabled = LOCAL_INDEX_CONFIG["enabled"]
+        self.refresh_interval = LOCAL_INDEX_CONFIG["refresh_interval_s"]
+        self.refresh_lookback = LOCAL_INDEX_CONFIG["refresh_lookback_s"]
+        self.max_chunks = LOCAL_INDEX_CONFIG["max_chunks_per_subject"]
+        self.page_size = LOCAL_INDEX_CONFIG["page_size"]
+        self._subjects: Dict[str, SubjectIndex] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Bumped by remove_document/invalidate: a load that started before is discarded
+        self._generations: Dict[str, int] = {}
+        # Subjects too large to mirror stay on the RPC path
+        self._oversized: set = set()
+        self.stats = {
+            "local_searches": 0, "rpc_fallbacks": 0,
+            "keyword_searches": 0, "keyword_fallbacks": 0,
+            "loads": 0, "refreshes": 0,
+        }
+
+    def _refresh_since(self, last_created_at: Optional[str]) -> Optional[str]:
+        """Refresh watermark: ``lookback`` before the newest row seen (already-held ids are skipped)."""
+        if not last_created_at:
+            return None
+        try:
+            newest = datetime.fromisoformat(last_created_at.replace("Z", "+00:00"))
+        except ValueError:
+            return last_created_at
+        return (newest - timedelta(seconds=self.refresh_lookback)).isoformat()
+
+    async def _fetch_rows(self, subject_id: str, since: Optional[str]) -> List[Dict]:
+        rows: List[Dict] = []
+        offset = 0
+        client = self.ahttp or httpx.AsyncClient(timeout=30.0)
+        try:
+            while True:
+                params = {
+                    "select": f"{ROW_FIELDS},embedding",
+                    "course_id": f"eq.{subject_id}",
+                    "order": "created_at.asc,id.asc",
+                    "offset": str(offset),
+                    "limit": str(self.page_size),
+                }
+                if since:
+                    params["created_at"] = f"gte.{since}"
+                res = await client.get(
+                    f"{self.rest_url}/knowledge_base", headers=_headers(), params=params, timeout=30.0
+                )
+                res.raise_for_status()
+                page = res.json() or []
+                rows.extend(page)
+                if len(rows) > self.max_chunks:
+                    raise OverflowError(f"subject {subject_id} exceeds {self.max_chunks} chunks")
+                if len(page) < self.page_size:
+                    return rows
+                offset += self.page_size
+        finally:
+            if self.ahttp is None:
+                await client.aclose()
+
+    async def _load(self, subject_id: str) -> None:
+        current = self._subjects.get(subject_id)
+        generation = self._generations.get(subject_id, 0)
+        try:
+            if current is None:
+                rows = await self._fetch_rows(subject_id, None)
+                if self._generations.get(subject_id, 0) != generation:
+                    return  # rows deleted mid-fetch; the next search reloads
+                index = SubjectIndex(subject_id)
+                index.add(rows)
+                self.stats["loads"] += 1
+            else:
+                index = current
+                rows = await self._fetch_rows(subject_id, self._refresh_since(index.last_created_at))
+                if self._generations.get(subject_id, 0) != generation:
+                    return  # may hold rows remove_document just dropped
+                index.add(rows)
+                if len(index.rows) > self.max_chunks:
+                    raise OverflowError(f"subject {subject_id} exceeds {self.max_chunks} chunks")
+                self.stats["refreshes"] += 1
+            index.loaded_at = time.time()
+            index.stale = False
+            self._subjects[subject_id] = index
+        except OverflowError:
+            self._oversized.add(subject_id)
+            self._subjects.pop(subject_id, None)
+        except Exception as e:
+            print(f"[LocalVectorIndex] load error for {subject_id}: {e}")
+        finally:
+            self._tasks.pop(subject_id, None)
+
+    def _schedule(self, subject_id: str) -> None:
+        if subject_id not in self._tasks:
+            self._tasks[subject_id] = asyncio.create_task(self._load(subject_id))
+
+    def ready(self, subject_id: str) -> Optional[SubjectIndex]:
+        """Return the subject's index if usable now; schedule a load/refresh otherwise."""
+        if not self.enabled or subject_id in self._oversized:
+            return None
+        index = self._subjects.get(subject_id)
+        if index is None:
+            self._schedule(subject_id)
+            return None
+        if index.stale or time.time() - index.loaded_at > self.refresh_interval:
+            self._schedule(subject_id)
+        return index
+
+    def search(
+        self, subject_id: str, query_embedding: np.ndarray, top_k: int, threshold: float
+    ) -> Optional[List[Dict]]:
+        """Top-k search, or None when the caller should use the RPC instead."""
+        index = self.ready(subject_id)
+        if index is None:
+            self.stats["rpc_fallbacks"] += 1
+            return None
+        self.stats["local_searches"] += 1
+        return index.search(query_embedding, top_k, threshold)
+
+    def keyword_search(self, subject_id: str, query: str, limit: int) -> Optional[List[Dict]]:
+        """BM25 search, or None when the caller should fall back to the database."""
+        index = self.ready(subject_id)
+        if index is None:
+            self.stats["keyword_fallbacks"] += 1
+            return None
+        self.stats["keyword_searches"] += 1
+        return index.keyword_search(query, limit)
+
+    async def aload(self, subject_id: str) -> Optional[SubjectIndex]:
+        """Load (or refresh) a subject now and wait for it — used by benchmarks/warmup."""
+        self._schedule(subject_id)
+        task = self._tasks.get(subject_id)
+        if task is not None:
+            await task
+        return self._subjects.get(subject_id)
+
+    def mark_stale(self, subject_id: str) -> None:
+        """New chunks were written — pick them up on the next search."""
+        index = self._subjects.get(subject_id)
+        if index is not None:
+            index.stale = True
+
+    def _bump(self, subject_id: str) -> None:
+        self._generations[subject_id] = self._generations.get(subject_id, 0) + 1
+
+    def invalidate(self, subject_id: str) -> None:
+        """Drop a subject's index; it is reloaded in full on its next search."""
+        self._bump(subject_id)
+        self._subjects.pop(subject_id, None)
+
+    def remove_document(self, subject_id: str, source_document: str) -> None:
+        self._bump(subject_id)
+        index = self._subjects.get(subject_id)
+        if index is not None:
+            index.remove_document(source_document)
+            index.stale = True  # a refresh discarded mid-fetch is retried
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "subjects": {sid: len(idx.rows) for sid, idx in self._subjects.items()},
+            "oversized_subjects": len(self._oversized),
+        }
@@ -0,0 +1,32 @@
+"""Metrics — small in-process latency trackers for service-level timings."""
+from collections import deque
+from typing import Dict
+import threading
+
+
+class RollingLatency:
+    """Keeps the last ``window`` samples (seconds) and reports p50/p95 in ms."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+        p50 = samples[len(samples) // 2]
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return {
+            "count": count,
+            "p50_ms": round(p50 * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1),
+        }
@@ -0,0 +1,256 @@
+"""Near-Duplicate Index — per-subject MinHash signatures with LSH buckets.
+
+Every stored chunk gets a MinHash signature over its word shingles; the
+signature is split into bands and each band is hashed into a bucket, so a
+new chunk is only compared with chunks that share at least one band. A
+candidate whose estimated Jaccard similarity (fraction of equal signature
+slots) reaches ``threshold`` is a near-duplicate. Subjects are loaded
+lazily from knowledge_base, which stays the source of truth: any deletion
+simply invalidates the subject and it is rebuilt on next use.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from config.rag_config import DEDUP_CONFIG
+
+_WORD = re.compile(r"\w+")
+# Smallest prime above 2**32: (a * h + b) stays below 2**64 for 32-bit a, b, h
+_PRIME = np.uint64(4294967311)
+
+# Identifies a stored chunk: content_hash, source_document, chunk_index, ingestion job/run
+ChunkRef = Dict
+
+
+class MinHasher:
+    """MinHash signatures from ``shingle_words``-word shingles of normalized text."""
+
+    def __init__(self, num_perm: int = 128, shingle_words: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        n = self.shingle_words
+        if len(words) < n:
+            shingles = {" ".join(words)} if words else set()
+        else:
+            shingles = {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+        # crc32 is stable across processes, unlike hash()
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        hashes = self.shingle_hashes(text)
+        if not hashes.size:
+            return None
+        return ((self._a * hashes[None, :] + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+class SubjectSignatures:
+    """Signatures, chunk refs and LSH buckets for one subject."""
+
+    def __init__(self, bands: int):
+        self.bands = bands
+        self.signatures: List[np.ndarray] = []
+        self.refs: List[ChunkRef] = []
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(i, band.tobytes()) for i, band in enumerate(np.array_split(signature, self.bands))]
+
+    def add(self, signature: np.ndarray, ref: ChunkRef) -> None:
+        position = len(self.refs)
+        self.signatures.append(signature)
+        self.refs.append(ref)
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(position)
+
+    def best_match(
+        self,
+        signature: np.ndarray,
+        threshold: float,
+        exclude: Optional[Callable[[ChunkRef], bool]] = None,
+    ) -> Optional[Tuple[ChunkRef, float]]:
+        candidates = {p for key in self._band_keys(signature) for p in self.buckets.get(key, ())}
+        best: Optional[Tuple[ChunkRef, float]] = None
+        for position in candidates:
+            ref = self.refs[position]
+            if exclude is not None and exclude(ref):
+                continue
+            similarity = float(np.mean(self.signatures[position] == signature))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (ref, similarity)
+        return best
+
+
+class NearDuplicateIndex:
+    """Lazily loaded per-subject MinHash/LSH index over knowledge_base chunks.
+
+    ``check_and_add`` is atomic per index, so concurrent uploads to one
+    subject cannot both store the same new text. Rows are fetched through
+    ``vector_store.fetch_subject_chunks`` on first use of a subject.
+    """
+
+    def __init__(
+        self,
+        vector_store=None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        threshold: Optional[float] = None,
+        shingle_words: Optional[int] = None,
+        action: Optional[str] = None,
+    ):
+        self.vector_store = vector_store
+        self.action = action or DEDUP_CONFIG["action"]
+        self.hasher = MinHasher(
+            num_perm=num_perm or DEDUP_CONFIG["num_perm"],
+            shingle_words=shingle_words or DEDUP_CONFIG["shingle_words"],
+        )
+        self.bands = bands or DEDUP_CONFIG["bands"]
+        self.threshold = threshold if threshold is not None else DEDUP_CONFIG["threshold"]
+        self._subjects: Dict[str, SubjectSignatures] = {}
+        self._lock = threading.Lock()
+        # Per-subject load locks: one fetch per subject, without holding _lock
+        self._loading: Dict[str, threading.Lock] = {}
+        # Bumped by invalidate so a load that raced it is not kept
+        self._generations: Dict[str, int] = {}
+        self.counters = {"checked": 0, "duplicates": 0, "loads": 0}
+
+    @staticmethod
+    def make_ref(chunk_metadata: Dict, source_document: str, chunk_index: int) -> ChunkRef:
+        return {
+            "content_hash": chunk_metadata.get("content_hash"),
+            "source_document": source_document,
+            "chunk_index": chunk_index,
+            "ingestion_job": chunk_metadata.get("ingestion_job"),
+            "ingestion_run": chunk_metadata.get("ingestion_run"),
+        }
+
+    def _subject(self, subject_id: str) -> SubjectSignatures:
+        """The subject's index, loaded on first use; the fetch runs outside ``_lock``."""
+        while True:
+            with self._lock:
+                index = self._subjects.get(subject_id)
+                if index is not None:
+                    return index
+                loading = self._loading.setdefault(subject_id, threading.Lock())
+            with loading:
+                with self._lock:
+                    index = self._subjects.get(subject_id)
+                    if index is not None:
+                        return index
+                    generation = self._generations.get(subject_id, 0)
+                index = self._load(subject_id)
+                with self._lock:
+                    # Invalidated mid-fetch: the rows may predate the change, so load again
+                    if self._generations.get(subject_id, 0) == generation:
+                        self._subjects[subject_id] = index
+                        self.counters["loads"] += 1
+                        return index
+
+    def _load(self, subject_id: str) -> SubjectSignatures:
+        index = SubjectSignatures(self.bands)
+        rows = self.vector_store.fetch_subject_chunks(subject_id) if self.vector_store else []
+        originals = {
+            (row.get("metadata") or {}).get("content_hash")
+            for row in rows
+            if not (row.get("metadata") or {}).get("duplicate_of")
+        }
+        for row in rows:
+            duplicate_of = (row.get("metadata") or {}).get("duplicate_of")
+            if duplicate_of and duplicate_of.get("content_hash") in originals:
+                continue  # linked duplicate: its original is indexed
+            signature = self.hasher.signature(row.get("content") or "")
+            if signature is not None:
+                index.add(signature, self.make_ref(
+                    row.get("metadata") or {}, row.get("source_document"), row.get("chunk_index")
+                ))
+        return index
+
+    def check_and_add(
+        self,
+        subject_id: str,
+        text: str,
+        ref: ChunkRef,
+        exclude: Optional[Callable[[ChunkRef], bool]] = None,
+    ) -> Optional[Tuple[ChunkRef, float]]:
+        """``(original ref, similarity)`` if ``text`` near-duplicates an indexed chunk.
+
+        Otherwise the chunk is added under ``ref`` and None is returned.
+        ``exclude`` hides chunks that are about to be replaced (e.g. the
+        previous version of the document being upserted).
+        """
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        while True:
+            index = self._subject(subject_id)
+            with self._lock:
+                if self._subjects.get(subject_id) is not index:
+                    continue  # invalidated since it was loaded
+                self.counters["checked"] += 1
+                match = index.best_match(signature, self.threshold, exclude)
+                if match is not None:
+                    self.counters["duplicates"] += 1
+                    return match
+                index.add(signature, ref)
+                return None
+
+    def screen(
+        self,
+        subject_id: str,
+        chunk: Dict,
+        source_document: str,
+        exclude: Optional[Callable[[ChunkRef], bool]] = None,
+    ) -> Tuple[Optional[Dict], bool]:
+        """Apply ``action`` to one tagged chunk: ``(chunk to store or None, is_duplicate)``.
+
+        ``skip`` drops a near-duplicate; ``link`` keeps it with
+        ``metadata.duplicate_of`` pointing at the original, so retrieval can
+        fold the two into one result.
+        """
+        ref = self.make_ref(chunk["metadata"], source_document, chunk["index"])
+        match = self.check_and_add(subject_id, chunk["text"], ref, exclude)
+        if match is None:
+            return chunk, False
+        if self.action == "skip":
+            return None, True
+        original, similarity = match
+        return {
+            **chunk,
+            "metadata": {
+                **chunk["metadata"],
+                "duplicate_of": {
+                    "source_document": original["source_document"],
+                    "chunk_index": original["chunk_index"],
+                    "content_hash": original["content_hash"],
+                },
+                "duplicate_similarity": round(similarity, 3),
+            },
+        }, True
+
+    def invalidate(self, subject_id: str) -> None:
+        """Forget a subject (rows deleted or an ingestion rolled back); rebuilt on next use."""
+        with self._lock:
+            self._generations[subject_id] = self._generations.get(subject_id, 0) + 1
+            self._subjects.pop(subject_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            checked = self.counters["checked"]
+            return {
+                **self.counters,
+                "subjects": len(self._subjects),
+                "chunks": sum(len(s.refs) for s in self._subjects.values()),
+                "dedup_ratio": round(self.counters["duplicates"] / checked, 4) if checked else 0.0,
+                "threshold": self.threshold,
+                "action": self.action,
+            }
@@ -0,0 +1,114 @@
+"""Parallel Extraction — PDF page ranges extracted across a process pool.
+
+Text extraction is CPU-bound, so large documents are split into page ranges
+and handed to worker processes. Every worker memory-maps the same file on
+disk (the spooled upload, or a temp copy of in-memory bytes) instead of
+receiving the PDF through a pipe, and caches its parsed document across
+the ranges it is given. Pages come back in page order. The pool is created
+on first use and reused across documents, so process start-up is paid once.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from services.document_processor import HAS_FITZ, HAS_PYPDF, PdfSource
+
+if HAS_FITZ:
+    import fitz
+if HAS_PYPDF:
+    from pypdf import PdfReader
+
+# Per worker process: path → (mmap, parsed document)
+_worker_docs: Dict[str, Tuple[mmap.mmap, object]] = {}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _open_shared(path: str):
+    if path not in _worker_docs:
+        # One document per worker at a time; drop the previous mapping
+        _worker_docs.clear()
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        doc = fitz.open(stream=mapped, filetype="pdf") if HAS_FITZ else PdfReader(mapped)
+        _worker_docs[path] = (mapped, doc)
+    return _worker_docs[path][1]
+
+
+def _extract_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Worker entry point: raw text of pages [start, end), 1-based page numbers."""
+    doc = _open_shared(path)
+    if HAS_FITZ:
+        return [(i + 1, doc[i].get_text()) for i in range(start, end)]
+    return [(i + 1, doc.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared extraction pool, recreated only when the worker count changes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: callers may be threads in a server, where fork is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def iter_pages_parallel(
+    source: PdfSource,
+    total_pages: int,
+    workers: int,
+    pages_per_task: int = 8,
+) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_num, raw_text)`` in page order, extracted by ``workers`` processes.
+
+    At most ``2 * workers`` ranges are in flight, so pages are still
+    streamed to the caller rather than collected up front.
+    """
+    if not (HAS_FITZ or HAS_PYPDF):
+        raise ImportError("No PDF library available. Install pypdf or PyMuPDF.")
+
+    temp_path = None
+    if isinstance(source, str):
+        path = source
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(source)
+            temp_path = path = f.name
+
+    ranges = deque(
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    )
+    pool = get_pool(workers)
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < 2 * workers:
+                start, end = ranges.popleft()
+                pending.append(pool.submit(_extract_range, path, start, end))
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if temp_path is not None:
+            os.unlink(temp_path)
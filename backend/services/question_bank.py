@@ -0,0 +1,330 @@
+"""Question Bank — pre-generated quiz questions per (subject, topic, difficulty) in SQLite.
+
+Quiz creation samples questions from the bank instead of waiting on a
+Gemini generation. Each bank is filled in batches by ``QuizGenerator`` and
+topped back up in the background once fewer than ``low_watermark``
+questions remain drawable; a question is drawn for at most ``max_serves``
+quizzes, least-served first. Questions are deduplicated by their
+normalized text, so regenerated batches only add what is new. When
+chunks are added or removed, only banks whose topic terms occur in the
+changed text are dropped.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from config.rag_config import QUESTION_BANK_CONFIG
+
+_WORD = re.compile(r"\w+")
+
+# (subject_id, topic key, difficulty)
+BankKey = Tuple[str, str, str]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+class QuestionBank:
+    """SQLite store of generated questions with single-flight background refill."""
+
+    def __init__(self, db_path: str, generator, config: Optional[Dict] = None):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.generator = generator
+        self.config = {**QUESTION_BANK_CONFIG, **(config or {})}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bank_questions ("
+            " subject_id TEXT NOT NULL, topic_key TEXT NOT NULL, difficulty TEXT NOT NULL,"
+            " question_key TEXT NOT NULL, question TEXT NOT NULL,"
+            " served INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,"
+            " PRIMARY KEY (subject_id, topic_key, difficulty, question_key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS bank_questions_draw"
+            " ON bank_questions (subject_id, topic_key, difficulty, served)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._fills: Dict[BankKey, asyncio.Task] = {}
+        # Set (and replaced) after every stored batch, so draws wake per batch
+        self._progress: Dict[BankKey, asyncio.Event] = {}
+        # (subject_id, topic key) → bumped by invalidate_topics so an in-flight fill drops stale batches
+        self._epochs: Dict[Tuple[str, str], int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters = {
+            "draws": 0, "hits": 0, "misses": 0, "generations": 0,
+            "generated": 0, "duplicates": 0, "refills": 0, "errors": 0, "invalidated_topics": 0,
+        }
+
+    @staticmethod
+    def make_key(subject_id: str, topic: str, difficulty: str) -> BankKey:
+        return (subject_id, _normalize(topic), difficulty)
+
+    @staticmethod
+    def terms(text: str) -> Set[str]:
+        """Normalized words of ``text`` (what ``invalidate_topics`` matches topics against)."""
+        return set(_WORD.findall((text or "").lower()))
+
+    @staticmethod
+    def _topic_terms(topic_key: str) -> Set[str]:
+        words = topic_key.split()
+        return {w for w in words if len(w) >= 3} or set(words)
+
+    @staticmethod
+    def question_key(question: Dict) -> str:
+        return hashlib.sha1(_normalize(question.get("question", "")).encode("utf-8")).hexdigest()
+
+    # ─── Storage ───
+
+    def add(self, key: BankKey, questions: List[Dict]) -> int:
+        """Store ``questions`` under ``key``; returns how many were new (not already banked)."""
+        now = time.time()
+        rows = [
+            (*key, self.question_key(q), json.dumps(q), now)
+            for q in questions
+            if isinstance(q, dict) and _normalize(q.get("question", ""))
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bank_questions"
+                " (subject_id, topic_key, difficulty, question_key, question, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            added = self._conn.total_changes - before
+            self.counters["generated"] += added
+            self.counters["duplicates"] += len(questions) - added
+        return added
+
+    def available(self, key: BankKey) -> int:
+        """Questions under ``key`` that can still be drawn."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM bank_questions"
+                " WHERE subject_id = ? AND topic_key = ? AND difficulty = ? AND served < ?",
+                (*key, self.config["max_serves"]),
+            ).fetchone()[0]
+
+    async def aavailable(self, key: BankKey) -> int:
+        return await asyncio.to_thread(self.available, key)
+
+    def sample(self, key: BankKey, count: int) -> List[Dict]:
+        """Draw up to ``count`` questions, least-served first (random within a tier)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_key, question FROM bank_questions"
+                " WHERE subject_id = ? AND topic_key = ? AND difficulty = ? AND served < ?"
+                " ORDER BY served, RANDOM() LIMIT ?",
+                (*key, self.config["max_serves"], count),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE bank_questions SET served = served + 1"
+                " WHERE subject_id = ? AND topic_key = ? AND difficulty = ? AND question_key = ?",
+                [(*key, question_key) for question_key, _ in rows],
+            )
+            self._conn.commit()
+        return [json.loads(question) for _, question in rows]
+
+    def invalidate_topics(self, subject_id: str, changed_terms: Iterable[str]) -> int:
+        """Drop the subject's banks whose topic terms occur in changed chunk text.
+
+        ``changed_terms`` are the ``terms`` of chunks added or removed. A
+        bank whose topic shares a term (3+ letters) with them may have been
+        built from, or now misses, that text; other banks keep their
+        questions and any fill in progress. Returns the number of topics dropped.
+        """
+        changed = set(changed_terms)
+        if not changed:
+            return 0
+        return self._drop_topics(subject_id, lambda topic_key: bool(self._topic_terms(topic_key) & changed))
+
+    def invalidate_subject(self, subject_id: str) -> int:
+        """Drop every bank of a subject (its chunks changed outside the API)."""
+        return self._drop_topics(subject_id, lambda topic_key: True)
+
+    def _drop_topics(self, subject_id: str, affects: Callable[[str], bool]) -> int:
+        with self._lock:
+            topics = {
+                row[0] for row in self._conn.execute(
+                    "SELECT DISTINCT topic_key FROM bank_questions WHERE subject_id = ?", (subject_id,)
+                )
+            }
+            topics.update(key[1] for key in list(self._fills) if key[0] == subject_id)
+            affected = [t for t in topics if affects(t)]
+            for topic_key in affected:
+                self._epochs[(subject_id, topic_key)] = self._epochs.get((subject_id, topic_key), 0) + 1
+            self._conn.executemany(
+                "DELETE FROM bank_questions WHERE subject_id = ? AND topic_key = ?",
+                [(subject_id, topic_key) for topic_key in affected],
+            )
+            self._conn.commit()
+            self.counters["invalidated_topics"] += len(affected)
+        return len(affected)
+
+    # ─── Filling ───
+
+    async def _afill(self, key: BankKey, topic: str, want: int) -> Optional[str]:
+        """Generate batches until ``want`` questions are drawable; returns an error, if any.
+
+        Stops early after ``max_batches`` calls or when a batch adds nothing
+        new (the topic's context is exhausted).
+        """
+        subject_id, topic_key, difficulty = key
+        epoch = self._epochs.get((subject_id, topic_key), 0)
+        for _ in range(self.config["max_batches"]):
+            if await self.aavailable(key) >= want:
+                return None
+            self.counters["generations"] += 1
+            quiz_data = await self.generator.agenerate_questions(
+                topic, subject_id, difficulty, self.config["batch_size"]
+            )
+            questions = quiz_data.get("questions") or []
+            if not questions:
+                self.counters["errors"] += 1
+                return quiz_data.get("error") or "No questions generated."
+            if self._epochs.get((subject_id, topic_key), 0) != epoch:
+                return None  # curriculum changed while generating
+            added = await asyncio.to_thread(self.add, key, questions)
+            self._notify(key)
+            if not added:
+                return None
+        return None
+
+    def _notify(self, key: BankKey) -> None:
+        event = self._progress.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _fill(self, key: BankKey, topic: str, want: int) -> asyncio.Task:
+        """The running fill for ``key``, or a new one up to ``want`` questions."""
+        task = self._fills.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._afill(key, topic, want))
+            self._fills[key] = task
+
+            def _forget(done: asyncio.Task) -> None:
+                if self._fills.get(key) is done:
+                    del self._fills[key]
+
+            task.add_done_callback(_forget)
+        return task
+
+    def _filling(self, key: BankKey) -> bool:
+        running = self._fills.get(key)
+        return running is not None and not running.done()
+
+    async def arefill_in_background(self, subject_id: str, topic: str, difficulty: str) -> bool:
+        """Top ``key`` back up to ``target_size`` if it is below ``low_watermark``."""
+        key = self.make_key(subject_id, topic, difficulty)
+        if self._filling(key):
+            return False
+        if await self.aavailable(key) >= self.config["low_watermark"]:
+            return False
+        if self._filling(key):  # started while counting
+            return False
+        self.counters["refills"] += 1
+        fill = self._fill(key, topic, self.config["target_size"])
+
+        async def _refill():
+            try:
+                error = await fill
+                if error:
+                    print(f"[QuestionBank] refill error for {key}: {error}")
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"[QuestionBank] refill error for {key}: {e}")
+
+        task = asyncio.create_task(_refill())
+        self._tasks.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    # ─── Draws ───
+
+    async def adraw(self, subject_id: str, topic: str, difficulty: str, count: int) -> Dict:
+        """Quiz data with ``count`` banked questions (same shape as ``QuizGenerator.agenerate_quiz``).
+
+        A warm bank answers from SQLite. A cold one waits only until
+        ``count`` questions are drawable: it joins a fill already in flight
+        (e.g. a prefill aiming for ``target_size``) but returns after the
+        batch that reaches ``count``, not when the whole fill ends. Either
+        way the bank, and its siblings in ``prefill_difficulties``, is
+        topped up afterwards.
+        """
+        key = self.make_key(subject_id, topic, difficulty)
+        self.counters["draws"] += 1
+        warm = await self.aavailable(key) >= count
+        if warm:
+            self.counters["hits"] += 1
+            error = None
+        else:
+            self.counters["misses"] += 1
+            error = await self._await_available(key, topic, count)
+        questions = await asyncio.to_thread(self.sample, key, count)
+
+        if not error:
+            for level in dict.fromkeys([difficulty, *self.config["prefill_difficulties"]]):
+                await self.arefill_in_background(subject_id, topic, level)
+
+        if not questions:
+            return {"error": error or "No curriculum materials found for this topic.", "questions": []}
+        return {"questions": questions, "difficulty": difficulty, "topic": topic, "from_bank": warm}
+
+    async def _await_available(self, key: BankKey, topic: str, count: int) -> Optional[str]:
+        """Wait until ``count`` questions are drawable; returns the fill error, if any.
+
+        Wakes after every stored batch. A fill that ends short of ``count``
+        (one joined late, or a batch with nothing new) is followed by one
+        more fill sized for this draw.
+        """
+        for _ in range(2):
+            fill = self._fill(key, topic, count)
+            while True:
+                # Take the event before counting so a batch stored in between still wakes us
+                progress = self._progress.setdefault(key, asyncio.Event())
+                if await self.aavailable(key) >= count:
+                    return None
+                if fill.done():
+                    break
+                waiter = asyncio.ensure_future(progress.wait())
+                try:
+                    # Never cancels ``fill``: other draws and refills may share it
+                    await asyncio.wait({fill, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    waiter.cancel()
+            error = fill.result()
+            if error:
+                return error
+        return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            banks, questions = self._conn.execute(
+                "SELECT COUNT(DISTINCT subject_id || '|' || topic_key || '|' || difficulty), COUNT(*)"
+                " FROM bank_questions"
+            ).fetchone()
+            draws = self.counters["draws"]
+            return {
+                **self.counters,
+                "banks": banks,
+                "questions": questions,
+                "hit_rate": round(self.counters["hits"] / draws, 4) if draws else 0.0,
+                "filling": len(self._fills),
+            }
+
+    async def aclose(self) -> None:
+        for task in [*self._tasks, *self._fills.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._fills.values(), return_exceptions=True)
+        self._conn.close()
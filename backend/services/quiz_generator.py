@@ -1,26 +1,36 @@
-"""Quiz Generator — Adaptive quiz generation from curriculum (no embeddings needed)."""
-from typing import Dict, List, Optional
+"""Quiz Generator — Adaptive quiz generation from curriculum context."""
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import json
 import random
 import httpx
 
 import google.generativeai as genai
 
-from config.settings import GEMINI_API_KEY, SUPABASE_URL, SUPABASE_ANON_KEY
-from config.rag_config import GEMINI_CONFIG
+from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from config.rag_config import GEMINI_CONFIG, QUIZ_CONFIG, RAG_SETTINGS
 from prompts.quiz_prompts import (
-    TOPIC_EXTRACTION_PROMPT,
     QUIZ_GENERATION_PROMPT,
     FEEDBACK_PROMPT,
 )
+from services.gemini_client import get_model
+from services.rate_limiter import get_limiter
+from services.context_budget import assemble_budgeted_context, estimate_tokens, page_label
+
+_QUIZ_GENERATION_CONFIG = genai.types.GenerationConfig(temperature=0.5, max_output_tokens=3000)
 
 
 class QuizGenerator:
     """Generates adaptive quizzes based on curriculum context and student mastery."""
 
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(GEMINI_CONFIG["model"])
+    def __init__(self, ahttp: Optional[httpx.AsyncClient] = None, rag_service=None):
+        self.model = get_model(GEMINI_CONFIG["model"])
+        self.limiter = get_limiter("generation")
+        # Shared keep-alive client from the service container, if provided
+        self.ahttp = ahttp
+        # Chat retriever for relevance-ranked context (afetch_context)
+        self.rag_service = rag_service
+        self.counters = {"hybrid": 0, "phrase": 0, "keyword": 0, "fallback": 0, "empty": 0}
 
     def _headers(self):
         return {
@@ -55,92 +65,111 @@ class QuizGenerator:
 
         return diff
 
-    def _fetch_context(self, topic: str, subject_id: str, limit: int = 10) -> str:
-        """Fetch relevant knowledge_base chunks directly from Supabase.
-        No embeddings needed — uses simple keyword filtering with fallback."""
-        headers = self._headers()
-        rows = []
-
-        try:
-            # Strategy 1: Try ilike search for the full topic phrase
-            url = (
-                f"{SUPABASE_URL}/rest/v1/knowledge_base"
-                f"?course_id=eq.{subject_id}"
-                f"&content=ilike.*{topic.strip().replace(' ', '*')}*"
-                f"&select=content,title,source_document,chunk_index"
-                f"&order=chunk_index.asc"
-                f"&limit={limit}"
-            )
-            resp = httpx.get(url, headers=headers, timeout=10.0)
-            if resp.status_code == 200:
-                rows = resp.json()
-        except Exception as e:
-            print(f"[QuizGenerator] ilike search error: {e}")
-
-        # Strategy 2: If no results, try each keyword individually
-        if not rows:
-            try:
-                keywords = topic.strip().split()
-                for kw in keywords[:3]:
-                    if len(kw) < 3:
-                        continue
-                    url = (
-                        f"{SUPABASE_URL}/rest/v1/knowledge_base"
-                        f"?course_id=eq.{subject_id}"
-                        f"&content=ilike.*{kw}*"
-                        f"&select=content,title,source_document,chunk_index"
-                        f"&order=chunk_index.asc"
-                        f"&limit={limit}"
-                    )
-                    resp = httpx.get(url, headers=headers, timeout=10.0)
-                    if resp.status_code == 200:
-                        found = resp.json()
-                        if found:
-                            rows = found
-                            break
-            except Exception as e:
-                print(f"[QuizGenerator] keyword search error: {e}")
+    # ─── Curriculum context ───
 
-        # Strategy 3: Fallback — just grab chunks from this subject
+    def _context_strategies(self, topic: str, subject_id: str, limit: int) -> List[Tuple[str, str]]:
+        """``(strategy, url)`` ilike lookups in priority order: full phrase, keywords, fallback."""
+        base = (
+            f"{SUPABASE_URL}/rest/v1/knowledge_base"
+            f"?course_id=eq.{subject_id}"
+            f"&select=content,title,source_document,chunk_index,metadata"
+            f"&order=chunk_index.asc"
+            f"&limit={limit}"
+        )
+        strategies = [("phrase", f"{base}&content=ilike.*{topic.strip().replace(' ', '*')}*")]
+        for kw in topic.strip().split()[:3]:
+            if len(kw) >= 3:
+                strategies.append(("keyword", f"{base}&content=ilike.*{kw}*"))
+        # Fallback — just grab chunks from this subject
+        strategies.append(("fallback", base))
+        return strategies
+
+    @staticmethod
+    def _format_context(rows: List[Dict]) -> str:
         if not rows:
+            return ""
+        # Hybrid rows carry a relevance score; ilike rows keep their chunk order
+        return assemble_budgeted_context(
+            rows,
+            RAG_SETTINGS["max_context_tokens"],
+            formatter=lambda i, row, text: (
+                f"[Source {i}: {row.get('source_document', 'Unknown')}{page_label(row)}]\n{text}"
+            ),
+        )["context"]
+
+    async def _aget_rows(self, url: str) -> List[Dict]:
+        timeout = QUIZ_CONFIG["fetch_timeout_s"]
+        if self.ahttp is not None:
+            resp = await self.ahttp.get(url, headers=self._headers(), timeout=timeout)
+        else:
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(url, headers=self._headers(), timeout=timeout)
+        return resp.json() if resp.status_code == 200 else []
+
+    async def _ahybrid_rows(self, topic: str, subject_id: str, limit: int) -> List[Dict]:
+        retrieval = await self.rag_service.aretrieve(topic, subject_id, top_k=limit)
+        return retrieval["results"]
+
+    async def afetch_rows(
+        self, topic: str, subject_id: str, limit: Optional[int] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Best non-empty context rows and the strategy that produced them.
+
+        With a RAG service the chat hybrid retriever (semantic + keyword,
+        relevance-ranked) answers in one round trip. Only when it comes back
+        empty or fails do the ilike strategies run: concurrently, with the
+        highest-priority non-empty result winning and every other lookup
+        still in flight cancelled.
+        """
+        limit = limit or QUIZ_CONFIG["context_limit"]
+        if self.rag_service is not None:
             try:
-                url = (
-                    f"{SUPABASE_URL}/rest/v1/knowledge_base"
-                    f"?course_id=eq.{subject_id}"
-                    f"&select=content,title,source_document,chunk_index"
-                    f"&order=chunk_index.asc"
-                    f"&limit={limit}"
-                )
-                resp = httpx.get(url, headers=headers, timeout=10.0)
-                if resp.status_code == 200:
-                    rows = resp.json()
+                rows = await self._ahybrid_rows(topic, subject_id, limit)
+                if rows:
+                    self.counters["hybrid"] += 1
+                    return rows, "hybrid"
             except Exception as e:
-                print(f"[QuizGenerator] fallback fetch error: {e}")
-
-        if not rows:
-            return ""
+                print(f"[QuizGenerator] hybrid search error: {e}")
 
-        parts = []
-        for i, row in enumerate(rows, 1):
-            src = row.get("source_document", "Unknown")
-            text = row.get("content", "")
-            parts.append(f"[Source {i}: {src}]\n{text}")
-
-        return "\n\n---\n\n".join(parts)
-
-    def extract_topics(self, conversation_history: str) -> List[Dict]:
-        """Extract quiz-worthy topics from a conversation."""
-        prompt = TOPIC_EXTRACTION_PROMPT.format(
-            conversation_history=conversation_history
-        )
+        strategies = self._context_strategies(topic, subject_id, limit)
+        tasks = [asyncio.create_task(self._aget_rows(url)) for _, url in strategies]
         try:
-            response = self.model.generate_content(prompt)
-            topics = self._parse_json(response.text)
-            return [t for t in topics if t.get("importance", 0) > 0.5]
-        except Exception:
-            return []
+            for (strategy, _), task in zip(strategies, tasks):
+                try:
+                    rows = await task
+                except Exception as e:
+                    print(f"[QuizGenerator] {strategy} search error: {e}")
+                    continue
+                if rows:
+                    self.counters[strategy] += 1
+                    return rows, strategy
+            self.counters["empty"] += 1
+            return [], None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def afetch_context(self, topic: str, subject_id: str, limit: Optional[int] = None) -> str:
+        """Budgeted curriculum context for ``topic`` (see ``afetch_rows``)."""
+        rows, _ = await self.afetch_rows(topic, subject_id, limit)
+        return self._format_context(rows)
+
+    def _quiz_prompt(self, topic: str, difficulty: str, context: str, question_count: int) -> str:
+        return QUIZ_GENERATION_PROMPT.format(
+            question_count=question_count,
+            topic=topic,
+            difficulty=difficulty,
+            context=context,
+        )
 
-    def generate_quiz(
+    def _quiz_result(self, text: str, topic: str, difficulty: str, context: str) -> Dict:
+        quiz_data = self._parse_json(text)
+        quiz_data["difficulty"] = difficulty
+        quiz_data["topic"] = topic
+        quiz_data["context_tokens"] = estimate_tokens(context)
+        return quiz_data
+
+    async def agenerate_quiz(
         self,
         topic: str,
         subject_id: str,
@@ -148,10 +177,19 @@ class QuizGenerator:
         question_count: int = 5,
     ) -> Dict:
         """Generate a quiz on a topic using curriculum context."""
-        difficulty = self.calculate_difficulty(mastery_score)
+        return await self.agenerate_questions(
+            topic, subject_id, self.calculate_difficulty(mastery_score), question_count
+        )
 
-        # Retrieve curriculum context directly (no embeddings)
-        context = self._fetch_context(topic, subject_id)
+    async def agenerate_questions(
+        self,
+        topic: str,
+        subject_id: str,
+        difficulty: str,
+        question_count: int = 5,
+    ) -> Dict:
+        """Generate ``question_count`` questions at a fixed difficulty (also fills the question bank)."""
+        context = await self.afetch_context(topic, subject_id)
 
         if not context:
             return {
@@ -159,29 +197,17 @@ class QuizGenerator:
                 "questions": [],
             }
 
-        prompt = QUIZ_GENERATION_PROMPT.format(
-            question_count=question_count,
-            topic=topic,
-            difficulty=difficulty,
-            context=context,
-        )
-
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.5,
-                    max_output_tokens=3000,
-                ),
-            )
-            quiz_data = self._parse_json(response.text)
-            quiz_data["difficulty"] = difficulty
-            quiz_data["topic"] = topic
-            return quiz_data
+            async with self.limiter.aslot():
+                response = await self.model.generate_content_async(
+                    self._quiz_prompt(topic, difficulty, context, question_count),
+                    generation_config=_QUIZ_GENERATION_CONFIG,
+                )
+            return self._quiz_result(response.text, topic, difficulty, context)
         except Exception as e:
             return {"error": f"Failed to generate quiz: {e}", "questions": []}
 
-    def evaluate_answer(
+    async def aevaluate_answer(
         self,
         question: str,
         correct_answer: str,
@@ -195,7 +221,8 @@ class QuizGenerator:
         )
 
         try:
-            response = self.model.generate_content(prompt)
+            async with self.limiter.aslot():
+                response = await self.model.generate_content_async(prompt)
             return self._parse_json(response.text)
         except Exception:
             is_correct = student_answer.strip().lower() == correct_answer.strip().lower()
@@ -1,112 +1,291 @@
 """RAG Service — Full retrieval-augmented generation pipeline."""
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
+import time
+
+import numpy as np
 
 from services.embedding_service import EmbeddingService
 from services.vector_store import VectorStore
 from services.socratic_engine import SocraticEngine
+from services.metrics import RollingLatency
+from services.response_cache import SemanticResponseCache, mastery_band
+from services.context_budget import assemble_budgeted_context
 from config.rag_config import RAG_SETTINGS
 
 
 class RAGService:
     """Orchestrates the full RAG pipeline: retrieve → assemble → generate."""
 
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
-        self.socratic_engine = SocraticEngine()
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_store: Optional[VectorStore] = None,
+        socratic_engine: Optional[SocraticEngine] = None,
+        response_cache: Optional[SemanticResponseCache] = None,
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store or VectorStore()
+        self.socratic_engine = socratic_engine or SocraticEngine()
+        self.response_cache = response_cache or SemanticResponseCache.from_config()
+        # Time from request start to the first streamed token
+        self.stream_ttft = RollingLatency()
+
+    @staticmethod
+    def assemble_context(retrieved_docs: List[Dict]) -> str:
+        """Assemble retrieved chunks into a formatted context string."""
+        return RAGService.assemble_budgeted(retrieved_docs)["context"]
+
+    @staticmethod
+    def assemble_budgeted(retrieved_docs: List[Dict]) -> Dict:
+        """Assemble context within RAG_SETTINGS["max_context_tokens"] and report token use."""
+        return assemble_budgeted_context(retrieved_docs, RAG_SETTINGS["max_context_tokens"])
+
+    @staticmethod
+    def _out_of_scope(boundary_check: Dict) -> Dict:
+        return {
+            "response": boundary_check["response"],
+            "sources": [],
+            "confidence": "low",
+            "intent": "out_of_scope",
+            "strategy": "boundary_enforcement",
+        }
+
+    @staticmethod
+    def _cacheable(prepared: Dict, legs: Dict) -> bool:
+        """Only answers built from complete retrieval are cached.
+
+        A timed-out or failed leg can make an in-scope question look out of
+        scope (keyword-only hits never reach the boundary), so such answers,
+        and out-of-scope answers in general, are never stored.
+        """
+        return prepared["cache_key"] is not None and all(
+            leg.get("status") == "ok" for leg in legs.values()
+        )
+
+    @staticmethod
+    def _format_sources(retrieved_docs: List[Dict]) -> List[Dict]:
+        sources = []
+        for doc in retrieved_docs[:3]:
+            metadata = doc.get("metadata") or {}
+            source = {
+                "source_document": doc.get("source_document", ""),
+                "relevance": doc.get("score", 0) or doc.get("similarity", 0),
+                "snippet": (doc.get("content", "") or doc.get("chunk_text", ""))[:200] + "...",
+            }
+            # Page provenance from the chunker, for citations
+            if isinstance(metadata, dict) and metadata.get("page_start"):
+                source["page_start"] = metadata["page_start"]
+                source["page_end"] = metadata.get("page_end", metadata["page_start"])
+            sources.append(source)
+        return sources
+
+    @staticmethod
+    def _confidence(retrieved_docs: List[Dict]) -> str:
+        top_score = max(
+            (doc.get("score", 0) or doc.get("similarity", 0) for doc in retrieved_docs),
+            default=0,
+        )
+        return "high" if top_score > 0.8 else "medium"
 
-    def retrieve(
-        self, query: str, subject_id: str, top_k: int = None
-    ) -> List[Dict]:
-        """Retrieve relevant context for a query."""
+    @classmethod
+    def _format_result(cls, retrieved_docs: List[Dict], result: Dict) -> Dict:
+        """Attach formatted sources + confidence to a Socratic result."""
+        return {
+            "response": result["response"],
+            "sources": cls._format_sources(retrieved_docs),
+            "confidence": cls._confidence(retrieved_docs),
+            "intent": result["intent"],
+            "strategy": result["strategy"],
+        }
+
+    async def aretrieve(
+        self,
+        query: str,
+        subject_id: str,
+        top_k: int = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Dict:
+        """Retrieve relevant context for a query.
+
+        Returns ``{"results": [...], "legs": {...}, "query_embedding": [...]}`` —
+        see VectorStore.ahybrid_search.
+        """
         top_k = top_k or RAG_SETTINGS["retrieval_top_k"]
         threshold = RAG_SETTINGS["relevance_threshold"]
 
-        # Generate query embedding
-        query_embedding = self.embedding_service.embed_query(query)
+        if query_embedding is None:
+            query_embedding = await self.embedding_service.aembed_query(query)
 
-        # Hybrid search (semantic + keyword)
-        results = self.vector_store.hybrid_search(
+        retrieval = await self.vector_store.ahybrid_search(
             query=query,
             query_embedding=query_embedding,
             subject_id=subject_id,
             top_k=top_k,
             threshold=threshold,
         )
+        retrieval["query_embedding"] = query_embedding
+        return retrieval
 
-        return results
+    async def _aprepare(
+        self,
+        query: str,
+        subject_id: str,
+        conversation_history: Optional[List[Dict]],
+        mastery_score: float,
+    ) -> Dict:
+        """Embed + plan the query and consult the response cache.
 
-    @staticmethod
-    def assemble_context(retrieved_docs: List[Dict]) -> str:
-        """Assemble retrieved chunks into a formatted context string."""
-        if not retrieved_docs:
-            return ""
-
-        context_parts = []
-        for i, doc in enumerate(retrieved_docs, 1):
-            score = doc.get("score", 0) or doc.get("similarity", 0)
-            source = doc.get("source_document", "Unknown")
-            text = doc.get("content", "") or doc.get("chunk_text", "")
-            context_parts.append(
-                f"[Source {i}: {source}] (Relevance: {score:.2f})\n{text}"
-            )
+        Only first-turn questions are cached: follow-ups depend on the history.
+        """
+        # Fit the local intent classifier in the background on first use
+        self.socratic_engine.intent_classifier.ensure_training(self.embedding_service.aembed_query)
+
+        query_embedding = await self.embedding_service.aembed_query(query)
+        plan = await self.socratic_engine.aplan(query, mastery_score, query_embedding)
 
-        return "\n\n---\n\n".join(context_parts)
+        cache_key = None
+        cached = None
+        if not conversation_history:
+            cache_key = (subject_id, plan["strategy"].value, mastery_band(mastery_score), query_embedding)
+            cached = self.response_cache.lookup(*cache_key)
 
-    def query(
+        return {
+            "query_embedding": query_embedding,
+            "plan": plan,
+            "cache_key": cache_key,
+            "cached": cached,
+        }
+
+    async def aquery(
         self,
         query: str,
         subject_id: str,
         conversation_history: Optional[List[Dict]] = None,
         mastery_score: float = 0.5,
     ) -> Dict:
-        """Full RAG + Socratic pipeline."""
-        # 1. Retrieve relevant context
-        retrieved_docs = self.retrieve(query, subject_id)
+        """Full RAG + Socratic pipeline — every network call is awaited."""
+        prepared = await self._aprepare(query, subject_id, conversation_history, mastery_score)
+        if prepared["cached"] is not None:
+            return {**prepared["cached"], "cached": True}
+
+        retrieval = await self.aretrieve(
+            query, subject_id, query_embedding=prepared["query_embedding"]
+        )
+        retrieved_docs = retrieval["results"]
 
-        # 2. Check curriculum boundary
         boundary_check = self.socratic_engine.check_curriculum_boundary(
             retrieved_docs, subject_id
         )
         if not boundary_check.get("allowed"):
-            return {
-                "response": boundary_check["response"],
-                "sources": [],
-                "confidence": "low",
-                "intent": "out_of_scope",
-                "strategy": "boundary_enforcement",
+            response = self._out_of_scope(boundary_check)
+        else:
+            assembled = self.assemble_budgeted(retrieved_docs)
+
+            result = await self.socratic_engine.agenerate_response(
+                query=query,
+                context=assembled["context"],
+                conversation_history=conversation_history,
+                mastery_score=mastery_score,
+                query_embedding=prepared["query_embedding"],
+                plan=prepared["plan"],
+            )
+            response = {
+                **self._format_result(retrieved_docs, result),
+                "context_tokens": assembled["tokens_used"],
             }
+            if result.get("failed"):
+                return {**response, "retrieval_legs": retrieval["legs"]}
 
-        # 3. Assemble context
-        context = self.assemble_context(retrieved_docs)
+        if response["intent"] != "out_of_scope" and self._cacheable(prepared, retrieval["legs"]):
+            self.response_cache.store(*prepared["cache_key"], response)
+        return {**response, "retrieval_legs": retrieval["legs"]}
 
-        # 4. Generate Socratic response
-        result = self.socratic_engine.generate_response(
-            query=query,
-            context=context,
-            conversation_history=conversation_history,
-            mastery_score=mastery_score,
-        )
+    async def astream(
+        self,
+        query: str,
+        subject_id: str,
+        conversation_history: Optional[List[Dict]] = None,
+        mastery_score: float = 0.5,
+    ) -> AsyncIterator[Dict]:
+        """Streaming variant of aquery.
 
-        # 5. Format sources
-        sources = [
-            {
-                "source_document": doc.get("source_document", ""),
-                "relevance": doc.get("score", 0) or doc.get("similarity", 0),
-                "snippet": (doc.get("content", "") or doc.get("chunk_text", ""))[:200] + "...",
-            }
-            for doc in retrieved_docs[:3]
-        ]
+        Yields ``{"event": ..., "data": {...}}`` dicts: one ``metadata`` event
+        (sources, intent, strategy), then ``token`` events, then ``done``.
+        """
+        started = time.perf_counter()
+        prepared = await self._aprepare(query, subject_id, conversation_history, mastery_score)
 
-        top_score = max(
-            (doc.get("score", 0) or doc.get("similarity", 0) for doc in retrieved_docs),
-            default=0,
+        def metadata(response: Dict, legs: Dict, cached: bool = False) -> Dict:
+            return {"event": "metadata", "data": {
+                "sources": response["sources"],
+                "confidence": response["confidence"],
+                "intent": response["intent"],
+                "strategy": response["strategy"],
+                "retrieval_legs": legs,
+                "context_tokens": response.get("context_tokens", 0),
+                "cached": cached,
+            }}
+
+        def done(**extra) -> Dict:
+            return {"event": "done", "data": {
+                **extra,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }}
+
+        if prepared["cached"] is not None:
+            cached = prepared["cached"]
+            yield metadata(cached, {}, cached=True)
+            self.stream_ttft.record(time.perf_counter() - started)
+            yield {"event": "token", "data": {"text": cached["response"]}}
+            yield done()
+            return
+
+        retrieval = await self.aretrieve(
+            query, subject_id, query_embedding=prepared["query_embedding"]
         )
+        retrieved_docs = retrieval["results"]
 
-        return {
-            "response": result["response"],
-            "sources": sources,
-            "confidence": "high" if top_score > 0.8 else "medium",
-            "intent": result["intent"],
-            "strategy": result["strategy"],
+        boundary_check = self.socratic_engine.check_curriculum_boundary(
+            retrieved_docs, subject_id
+        )
+        if not boundary_check.get("allowed"):
+            response = self._out_of_scope(boundary_check)
+            yield metadata(response, retrieval["legs"])
+            yield {"event": "token", "data": {"text": response["response"]}}
+            yield done()
+            return
+
+        plan = prepared["plan"]
+        assembled = self.assemble_budgeted(retrieved_docs)
+        response = {
+            **self._format_result(retrieved_docs, {
+                "response": "",
+                "intent": plan["intent"].value,
+                "strategy": plan["strategy"].value,
+            }),
+            "context_tokens": assembled["tokens_used"],
         }
+        yield metadata(response, retrieval["legs"])
+
+        context = assembled["context"]
+        ttft_ms = None
+        parts: List[str] = []
+        try:
+            async for text in self.socratic_engine.astream_text(
+                query, plan["strategy"], context, conversation_history
+            ):
+                if ttft_ms is None:
+                    ttft = time.perf_counter() - started
+                    self.stream_ttft.record(ttft)
+                    ttft_ms = round(ttft * 1000, 1)
+                parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+        except Exception as e:
+            yield {"event": "error", "data": {
+                "message": f"I encountered an issue processing your question. Please try rephrasing. (Error: {e})"
+            }}
+            return
+
+        if parts and self._cacheable(prepared, retrieval["legs"]):
+            self.response_cache.store(*prepared["cache_key"], {**response, "response": "".join(parts)})
+        yield done(ttft_ms=ttft_ms)
@@ -0,0 +1,184 @@
+"""Rate Limiter — shared token bucket + AIMD concurrency control for Gemini calls.
+
+Every Gemini caller goes through a named limiter (``"embedding"`` or
+``"generation"``). The token bucket caps the request rate; the concurrency
+window grows additively on success and halves on 429/503, with a cooldown
+before new requests start again.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+import asyncio
+import threading
+import time
+
+from config.rag_config import RATE_LIMIT_CONFIG
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    _OVERLOAD_TYPES = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+    )
+except ImportError:
+    _OVERLOAD_TYPES = ()
+
+_POLL_INTERVAL = 0.02
+
+
+def is_overload(exc: BaseException) -> bool:
+    """True for quota/overload errors (HTTP 429/503) from Gemini or httpx."""
+    if _OVERLOAD_TYPES and isinstance(exc, _OVERLOAD_TYPES):
+        return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) in (429, 503):
+        return True
+    return any(code in str(exc) for code in ("429", "503", "RESOURCE_EXHAUSTED"))
+
+
+class AdaptiveLimiter:
+    """Token bucket for rate + AIMD window for concurrency, usable from sync and async code."""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 4,
+        cooldown_s: float = 1.0,
+        max_cooldown_s: float = 30.0,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.base_cooldown = cooldown_s
+        self.max_cooldown = max_cooldown_s
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._limit = float(initial_concurrency)
+        self._in_flight = 0
+        self._cooldown = cooldown_s
+        self._blocked_until = 0.0
+        self.throttled_requests = 0
+        self.throttled_wait_s = 0.0
+        self.successes = 0
+        self.backoffs = 0
+
+    # ─── Acquire / release ───
+
+    def _try_acquire(self) -> float:
+        """Take a slot + token if possible; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._in_flight >= int(self._limit):
+                return _POLL_INTERVAL
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self._in_flight += 1
+            return 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        if waited > 1e-3:
+            with self._lock:
+                self.throttled_requests += 1
+                self.throttled_wait_s += waited
+
+    def acquire(self) -> None:
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                break
+            time.sleep(wait)
+        self._record_wait(time.monotonic() - started)
+
+    async def aacquire(self) -> None:
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        self._record_wait(time.monotonic() - started)
+
+    def release(self, overloaded: bool = False) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if overloaded:
+                # Multiplicative decrease + cooldown that doubles while 429s persist
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                self._blocked_until = time.monotonic() + self._cooldown
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                self.backoffs += 1
+            else:
+                # Additive increase: about +1 slot per window of successes
+                self._limit = min(self.max_concurrency, self._limit + 1 / max(self._limit, 1))
+                self._cooldown = self.base_cooldown
+                self.successes += 1
+
+    @contextmanager
+    def slot(self):
+        """``with limiter.slot(): call_gemini()`` — feeds the outcome back into AIMD."""
+        self.acquire()
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self.release(overloaded)
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async variant of ``slot``."""
+        await self.aacquire()
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            self.release(overloaded)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency_limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "rate_per_s": self.rate,
+                "throttled_requests": self.throttled_requests,
+                "throttled_wait_s": round(self.throttled_wait_s, 3),
+                "successes": self.successes,
+                "backoffs": self.backoffs,
+                "cooling_down": time.monotonic() < self._blocked_until,
+            }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    """Process-wide limiter shared by every caller of the same Gemini API."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, **RATE_LIMIT_CONFIG[name])
+        return _limiters[name]
+
+
+def limiter_snapshots() -> Dict[str, Dict]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
@@ -0,0 +1,136 @@
+"""Response Cache — semantic cache of Socratic answers per subject.
+
+A cached answer is reused when a new first-turn question for the same
+subject, strategy and mastery band embeds within ``similarity_threshold``
+(cosine) of a cached question. Entries are dropped whenever the subject's
+documents change.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from config.rag_config import RESPONSE_CACHE_CONFIG
+
+
+def mastery_band(mastery_score: float) -> str:
+    low, high = RESPONSE_CACHE_CONFIG["mastery_bands"]
+    if mastery_score < low:
+        return "low"
+    if mastery_score < high:
+        return "mid"
+    return "high"
+
+
+class SemanticResponseCache:
+    """Size-bounded (LRU) semantic response cache with per-subject invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = 2000,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 6 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # entry id → (bucket key, unit embedding, response, created_at); order = LRU
+        self._entries: "OrderedDict[int, Tuple[Tuple, np.ndarray, Dict, float]]" = OrderedDict()
+        # (subject, strategy, band) → entry ids, plus a stacked matrix rebuilt lazily
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._matrices: Dict[Tuple, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls) -> "SemanticResponseCache":
+        return cls(
+            max_entries=RESPONSE_CACHE_CONFIG["max_entries"],
+            similarity_threshold=RESPONSE_CACHE_CONFIG["similarity_threshold"],
+            ttl_seconds=RESPONSE_CACHE_CONFIG["ttl_seconds"],
+        )
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, entry_id: int) -> None:
+        bucket, _, _, _ = self._entries.pop(entry_id)
+        self._buckets[bucket].remove(entry_id)
+        self._matrices.pop(bucket, None)
+        if not self._buckets[bucket]:
+            del self._buckets[bucket]
+
+    def lookup(
+        self, subject_id: str, strategy: str, band: str, embedding: np.ndarray
+    ) -> Optional[Dict]:
+        bucket = (subject_id, strategy, band)
+        query = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            ids = self._buckets.get(bucket)
+            if ids:
+                matrix = self._matrices.get(bucket)
+                if matrix is None:
+                    matrix = np.vstack([self._entries[i][1] for i in ids])
+                    self._matrices[bucket] = matrix
+                sims = matrix @ query
+                best = int(np.argmax(sims))
+                entry_id = ids[best]
+                if sims[best] >= self.similarity_threshold:
+                    _, _, response, created_at = self._entries[entry_id]
+                    if now - created_at <= self.ttl_seconds:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return dict(response, cache_similarity=round(float(sims[best]), 4))
+                    self._drop(entry_id)
+            self.misses += 1
+            return None
+
+    def store(
+        self, subject_id: str, strategy: str, band: str, embedding: np.ndarray, response: Dict
+    ) -> None:
+        bucket = (subject_id, strategy, band)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (bucket, self._unit(embedding), dict(response), time.time())
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            self._matrices.pop(bucket, None)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_subject(self, subject_id: str) -> int:
+        """Drop every cached answer for a subject (its documents changed)."""
+        with self._lock:
+            doomed = [
+                entry_id
+                for bucket, ids in self._buckets.items() if bucket[0] == subject_id
+                for entry_id in ids
+            ]
+            for entry_id in doomed:
+                self._drop(entry_id)
+            self.invalidations += 1
+            return len(doomed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
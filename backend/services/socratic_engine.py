@@ -1,13 +1,16 @@
 """Socratic Engine — Intent classification and guided response generation."""
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import json
 
 import google.generativeai as genai
+import numpy as np
 
-from config.settings import GEMINI_API_KEY
 from config.rag_config import GEMINI_CONFIG
 from prompts.socratic_prompts import BASE_RULES, STRATEGY_MAP
+from services.gemini_client import get_model
+from services.intent_classifier import IntentClassifier
+from services.rate_limiter import get_limiter
 
 
 class Intent(str, Enum):
@@ -36,13 +39,14 @@ INTENT_STRATEGY_MAP = {
 class SocraticEngine:
     """Generates Socratic-method responses that guide students to discover answers."""
 
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(GEMINI_CONFIG["model"])
+    def __init__(self, intent_classifier: Optional[IntentClassifier] = None):
+        self.model = get_model(GEMINI_CONFIG["model"])
+        self.intent_classifier = intent_classifier or IntentClassifier()
+        self.limiter = get_limiter("generation")
 
-    def classify_intent(self, query: str) -> Intent:
-        """Classify the student's query intent."""
-        prompt = f"""Classify this student query into exactly ONE of these categories:
+    @staticmethod
+    def _intent_prompt(query: str) -> str:
+        return f"""Classify this student query into exactly ONE of these categories:
 - conceptual_understanding: Asking what something is or how it works
 - problem_solving: Asking how to solve a specific problem
 - clarification: Asking why something works a certain way
@@ -52,19 +56,37 @@ Query: "{query}"
 
 Return ONLY the category name, nothing else."""
 
+    @staticmethod
+    def _parse_intent(text: str) -> Intent:
+        intent_str = text.strip().lower().replace('"', '').replace("'", '')
+        intent_map = {
+            "conceptual_understanding": Intent.CONCEPTUAL,
+            "problem_solving": Intent.PROBLEM_SOLVING,
+            "clarification": Intent.CLARIFICATION,
+            "verification": Intent.VERIFICATION,
+        }
+        return intent_map.get(intent_str, Intent.CONCEPTUAL)
+
+    async def aclassify_intent(
+        self, query: str, query_embedding: Optional[np.ndarray] = None
+    ) -> Intent:
+        """Classify the student's query intent (local classifier first, LLM on low confidence)."""
+        label, _, source = self.intent_classifier.classify(query, query_embedding)
+        if label is not None:
+            self.intent_classifier.record(source)
+            return Intent(label)
+
+        self.intent_classifier.record("llm_fallback")
         try:
-            response = self.model.generate_content(prompt)
-            intent_str = response.text.strip().lower().replace('"', '').replace("'", '')
-
-            intent_map = {
-                "conceptual_understanding": Intent.CONCEPTUAL,
-                "problem_solving": Intent.PROBLEM_SOLVING,
-                "clarification": Intent.CLARIFICATION,
-                "verification": Intent.VERIFICATION,
-            }
-            return intent_map.get(intent_str, Intent.CONCEPTUAL)
+            async with self.limiter.aslot():
+                response = await self.model.generate_content_async(self._intent_prompt(query))
+            intent = self._parse_intent(response.text)
         except Exception:
             return Intent.CONCEPTUAL
+        if query_embedding is not None:
+            self.intent_classifier.learn(intent.value, query_embedding)
+            self.intent_classifier.record("learned")
+        return intent
 
     def select_strategy(
         self, intent: Intent, mastery_score: float = 0.5
@@ -80,20 +102,15 @@ Return ONLY the category name, nothing else."""
         strategy_text = STRATEGY_MAP.get(strategy.value, "")
         return base + "\n\n" + strategy_text
 
-    def generate_response(
+    def _build_full_prompt(
         self,
         query: str,
+        strategy: SocraticStrategy,
         context: str,
         conversation_history: Optional[List[Dict]] = None,
-        mastery_score: float = 0.5,
-    ) -> Dict:
-        """Full Socratic pipeline: classify → strategize → generate."""
-        intent = self.classify_intent(query)
-        strategy = self.select_strategy(intent, mastery_score)
-        system_prompt = self.build_prompt(strategy, context)
-
-        # Build the full prompt
-        full_prompt = system_prompt
+    ) -> str:
+        """System prompt + recent history + the student's question."""
+        full_prompt = self.build_prompt(strategy, context)
 
         if conversation_history:
             history_text = "\n".join(
@@ -103,17 +120,42 @@ Return ONLY the category name, nothing else."""
             full_prompt += f"\n\nConversation History:\n{history_text}"
 
         full_prompt += f"\n\nStudent Question: {query}\n\nYour Socratic Response:"
+        return full_prompt
+
+    @staticmethod
+    def _generation_config():
+        return genai.types.GenerationConfig(
+            temperature=0.7,
+            max_output_tokens=GEMINI_CONFIG["max_output_tokens"],
+        )
+
+    async def agenerate_response(
+        self,
+        query: str,
+        context: str,
+        conversation_history: Optional[List[Dict]] = None,
+        mastery_score: float = 0.5,
+        query_embedding: Optional[np.ndarray] = None,
+        plan: Optional[Dict] = None,
+    ) -> Dict:
+        """Full Socratic pipeline: classify → strategize → generate.
+
+        ``plan`` (from ``aplan``) skips re-classifying an already planned query.
+        """
+        plan = plan or await self.aplan(query, mastery_score, query_embedding)
+        intent, strategy = plan["intent"], plan["strategy"]
+        full_prompt = self._build_full_prompt(query, strategy, context, conversation_history)
 
+        failed = False
         try:
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=GEMINI_CONFIG["max_output_tokens"],
-                ),
-            )
+            async with self.limiter.aslot():
+                response = await self.model.generate_content_async(
+                    full_prompt,
+                    generation_config=self._generation_config(),
+                )
             response_text = response.text
         except Exception as e:
+            failed = True
             response_text = f"I encountered an issue processing your question. Please try rephrasing. (Error: {e})"
 
         return {
@@ -121,8 +163,48 @@ Return ONLY the category name, nothing else."""
             "intent": intent.value,
             "strategy": strategy.value,
             "mastery_considered": mastery_score,
+            "failed": failed,
         }
 
+    async def aplan(
+        self,
+        query: str,
+        mastery_score: float = 0.5,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Dict:
+        """Classify + pick a strategy up front (streaming sends these before any tokens)."""
+        intent = await self.aclassify_intent(query, query_embedding)
+        strategy = self.select_strategy(intent, mastery_score)
+        return {"intent": intent, "strategy": strategy}
+
+    async def astream_text(
+        self,
+        query: str,
+        strategy: SocraticStrategy,
+        context: str,
+        conversation_history: Optional[List[Dict]] = None,
+    ) -> AsyncIterator[str]:
+        """Yield response text chunks from Gemini's streaming API as they arrive.
+
+        The limiter slot is held until the stream finishes, since the
+        request stays open on Gemini's side until then.
+        """
+        full_prompt = self._build_full_prompt(query, strategy, context, conversation_history)
+        async with self.limiter.aslot():
+            response = await self.model.generate_content_async(
+                full_prompt,
+                generation_config=self._generation_config(),
+                stream=True,
+            )
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety/finish metadata)
+                    continue
+                if text:
+                    yield text
+
     def check_curriculum_boundary(
         self, retrieved_docs: List[Dict], subject_id: str, threshold: float = 0.7
     ) -> Dict:
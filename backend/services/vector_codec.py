@@ -0,0 +1,48 @@
+"""Vector Codec — float32 embeddings and their pgvector text literal.
+
+Embeddings are held as 1-D ``float32`` NumPy arrays everywhere in the
+services (pgvector stores float32, so wider values only cost memory). On
+the wire to PostgREST a vector is sent as a pgvector literal
+``"[0.0123457,-0.045,...]"`` printed with a bounded number of significant
+digits, from a format string pre-built once per dimension — instead of
+``json.dumps`` of a Python float list, which prints up to 17 digits a value.
+"""
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from config.rag_config import EMBEDDING_CONFIG
+
+VectorLike = Union[np.ndarray, Iterable[float]]
+
+# (dimension, precision) → "[%.6g,%.6g,...]"
+_templates: Dict[Tuple[int, int], str] = {}
+
+
+def as_float32(values: VectorLike) -> np.ndarray:
+    """1-D float32 view/copy of an embedding (list, array or array-like)."""
+    return np.asarray(values, dtype=np.float32).reshape(-1)
+
+
+def _template(dimension: int, precision: int) -> str:
+    key = (dimension, precision)
+    template = _templates.get(key)
+    if template is None:
+        template = "[" + ",".join([f"%.{precision}g"] * dimension) + "]"
+        _templates[key] = template
+    return template
+
+
+def to_pgvector(values: VectorLike, precision: Optional[int] = None) -> str:
+    """pgvector text literal with ``precision`` significant digits per value."""
+    vector = as_float32(values)
+    precision = precision or EMBEDDING_CONFIG["wire_precision"]
+    return _template(vector.shape[0], precision) % tuple(vector.tolist())
+
+
+def parse_pgvector(value) -> np.ndarray:
+    """pgvector columns come back from PostgREST as a "[0.1,0.2,...]" string."""
+    if isinstance(value, str):
+        body = value.strip().strip("[]")
+        return np.array(body.split(",") if body else [], dtype=np.float32)
+    return as_float32(value)
@@ -1,9 +1,18 @@
 """Vector Store Service — Supabase pgvector operations via REST API."""
+import asyncio
 import httpx
+import numpy as np
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 import json
+import time
+import uuid
 
 from config.settings import SUPABASE_URL, SUPABASE_ANON_KEY
+from config.rag_config import BULK_INSERT_CONFIG, RAG_SETTINGS
+from services.local_index import LocalVectorIndex
+from services.vector_codec import to_pgvector
 
 
 def _headers() -> dict:
@@ -19,18 +28,48 @@ def _headers() -> dict:
 class VectorStore:
     """Interface to Supabase pgvector for storing and searching embeddings via REST."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        http: Optional[httpx.Client] = None,
+        ahttp: Optional[httpx.AsyncClient] = None,
+        local_index: Optional[LocalVectorIndex] = None,
+    ):
         self.base_url = SUPABASE_URL
         self.rest_url = f"{SUPABASE_URL}/rest/v1"
+        # Shared keep-alive pools from the service container; when absent,
+        # each call opens (and closes) its own client.
+        self.http = http
+        self.ahttp = ahttp
+        # In-process mirror used for semantic search once a subject is loaded
+        self.local_index = local_index
+        # PostgREST aggregate functions: None until probed by document_stats
+        self.aggregates_supported: Optional[bool] = None
 
-    def store_chunks_with_embeddings(
-        self,
+    @contextmanager
+    def _client(self):
+        if self.http is not None:
+            yield self.http
+        else:
+            with httpx.Client(timeout=30.0) as client:
+                yield client
+
+    @asynccontextmanager
+    async def _aclient(self):
+        if self.ahttp is not None:
+            yield self.ahttp
+        else:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                yield client
+
+    # ─── Request builders (shared by sync + async paths) ───
+
+    @staticmethod
+    def _build_records(
         chunks: List[Dict],
-        embeddings: List[List[float]],
+        embeddings: List[np.ndarray],
         subject_id: str,
         source_document: str,
     ) -> List[Dict]:
-        """Store document chunks with their embeddings in knowledge_base."""
         records = []
         for chunk, embedding in zip(chunks, embeddings):
             records.append({
@@ -38,102 +77,442 @@ class VectorStore:
                 "title": chunk.get("metadata", {}).get("title", source_document),
                 "content": chunk["text"],
                 "chunk_index": chunk["index"],
-                "embedding": json.dumps(embedding),
+                "embedding": to_pgvector(embedding),
                 "source_document": source_document,
                 "metadata": chunk.get("metadata", {}),
             })
+        return records
+
+    @staticmethod
+    def _similarity_payload(
+        query_embedding: np.ndarray, subject_id: str, top_k: int, threshold: float
+    ) -> Dict:
+        return {
+            "query_embedding": to_pgvector(query_embedding),
+            "filter_subject_id": subject_id,
+            "match_threshold": threshold,
+            "match_count": top_k,
+        }
+
+    @staticmethod
+    def _keyword_params(query: str, subject_id: str, limit: int) -> Dict:
+        return {
+            "select": "id,course_id,title,content,chunk_index,source_document,metadata",
+            "course_id": f"eq.{subject_id}",
+            "content": f"ilike.*{query.replace(' ', '*')}*",
+            "limit": str(limit),
+        }
+
+    # ─── Sync API (document ingestion, scripts) ───
+
+    def store_chunks_with_embeddings(
+        self,
+        chunks: List[Dict],
+        embeddings: List[np.ndarray],
+        subject_id: str,
+        source_document: str,
+    ) -> Dict:
+        """Store document chunks with their embeddings in knowledge_base; returns write stats."""
+        records = self._build_records(chunks, embeddings, subject_id, source_document)
+        return self.bulk_insert(records)
+
+    @staticmethod
+    def _plan_insert_batches(payloads: List[bytes], max_bytes: int, max_rows: int) -> List[List[bytes]]:
+        """Group serialized rows into JSON arrays of at most ``max_bytes``/``max_rows``."""
+        batches: List[List[bytes]] = []
+        current: List[bytes] = []
+        size = 2  # "[" + "]"
+        for payload in payloads:
+            if current and (len(current) >= max_rows or size + len(payload) + 1 > max_bytes):
+                batches.append(current)
+                current, size = [], 2
+            current.append(payload)
+            size += len(payload) + 1
+        if current:
+            batches.append(current)
+        return batches
+
+    def _insert_batch(self, body: bytes, batch_tag: str) -> int:
+        """POST one batch with ``return=minimal``; returns the number of retries used.
+
+        Rows carry ``metadata.ingestion_batch``: before a retry, whatever an
+        earlier attempt may have committed (e.g. when only the response timed
+        out) is deleted, so retrying never duplicates rows.
+        """
+        max_retries = BULK_INSERT_CONFIG["max_retries"]
+        timeout = BULK_INSERT_CONFIG["timeout_s"]
+        headers = {**_headers(), "Prefer": "return=minimal"}
+        for attempt in range(max_retries + 1):
+            try:
+                with self._client() as client:
+                    if attempt:
+                        response = client.delete(
+                            f"{self.rest_url}/knowledge_base",
+                            headers=headers,
+                            params={"metadata->>ingestion_batch": f"eq.{batch_tag}"},
+                            timeout=timeout,
+                        )
+                        response.raise_for_status()
+                    response = client.post(
+                        f"{self.rest_url}/knowledge_base",
+                        headers=headers,
+                        content=body,
+                        timeout=timeout,
+                    )
+                    response.raise_for_status()
+                return attempt
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == max_retries:
+                    raise
+                time.sleep(BULK_INSERT_CONFIG["retry_backoff_s"] * 2 ** attempt)
+
+    def bulk_insert(self, records: List[Dict]) -> Dict:
+        """Insert records in payload-bounded batches with bounded parallelism.
 
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
+        Returns ``rows``, ``batches``, ``bytes``, ``retries``, ``seconds`` and
+        ``rows_per_second``. Raises if any batch still fails after retries.
+        """
+        started = time.perf_counter()
+        # Serialize once with a placeholder tag, then stamp each batch's own tag
+        placeholder = uuid.uuid4().hex
+        marker = json.dumps({"ingestion_batch": placeholder})[1:-1].encode("utf-8")
+        payloads = [
+            json.dumps({
+                **record,
+                "metadata": {**record.get("metadata", {}), "ingestion_batch": placeholder},
+            }).encode("utf-8")
+            for record in records
+        ]
+        batches = self._plan_insert_batches(
+            payloads, BULK_INSERT_CONFIG["max_payload_bytes"], BULK_INSERT_CONFIG["max_rows"]
+        )
+        bodies = []
+        for i, rows in enumerate(batches):
+            tag = f"{placeholder}-{i}"
+            stamped = marker.replace(placeholder.encode("utf-8"), tag.encode("utf-8"))
+            bodies.append((b"[" + b",".join(rows).replace(marker, stamped) + b"]", tag))
+
+        retries = 0
+        if len(bodies) == 1:
+            retries = self._insert_batch(*bodies[0])
+        elif bodies:
+            workers = min(BULK_INSERT_CONFIG["concurrency"], len(bodies))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                retries = sum(pool.map(lambda args: self._insert_batch(*args), bodies))
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": len(records),
+            "batches": len(bodies),
+            "bytes": sum(len(body) for body, _ in bodies),
+            "retries": retries,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(len(records) / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def delete_tagged_chunks(self, subject_id: str, tag: str, value: str) -> int:
+        """Remove rows whose ``metadata.<tag>`` equals ``value`` (ingestion job/run tags)."""
+        with self._client() as client:
+            response = client.delete(
                 f"{self.rest_url}/knowledge_base",
-                headers=_headers(),
-                json=records,
+                # Count only: return=representation would echo every row and its embedding
+                headers={**_headers(), "Prefer": "return=minimal, count=exact"},
+                params={
+                    "course_id": f"eq.{subject_id}",
+                    f"metadata->>{tag}": f"eq.{value}",
+                },
+                timeout=30.0,
             )
             response.raise_for_status()
-            return response.json()
+            # Content-Range: "*/<deleted>"
+            content_range = response.headers.get("content-range", "")
+            total = content_range.split("/")[-1] if "/" in content_range else ""
+            return int(total) if total.isdigit() else 0
 
-    def similarity_search(
+    def fetch_document_chunks(self, subject_id: str, source_document: str, page_size: int = 1000) -> List[Dict]:
+        """``id``, ``chunk_index``, ``content`` and ``metadata`` of a document's rows (no embeddings)."""
+        return self._fetch_rows(
+            {
+                "select": "id,chunk_index,content,metadata",
+                "course_id": f"eq.{subject_id}",
+                "source_document": f"eq.{source_document}",
+            },
+            page_size,
+        )
+
+    def fetch_subject_chunks(self, subject_id: str, page_size: int = 1000) -> List[Dict]:
+        """Every row of a subject without embeddings (near-duplicate index loads)."""
+        return self._fetch_rows(
+            {
+                "select": "id,source_document,chunk_index,content,metadata",
+                "course_id": f"eq.{subject_id}",
+            },
+            page_size,
+        )
+
+    def document_stats(self, subject_id: str) -> List[Dict]:
+        """Per-document ``chunks``, ``uploaded_at`` and ``updated_at`` for a subject.
+
+        Uses a PostgREST aggregate (one grouped query) when the project has
+        aggregates enabled; otherwise scans ``source_document,created_at``
+        page by page and groups here.
+        """
+        if self.aggregates_supported is not False:
+            with self._client() as client:
+                response = client.get(
+                    f"{self.rest_url}/knowledge_base",
+                    headers=_headers(),
+                    params={
+                        "select": "source_document,chunks:count(),"
+                                  "uploaded_at:created_at.min(),updated_at:created_at.max()",
+                        "course_id": f"eq.{subject_id}",
+                    },
+                    timeout=30.0,
+                )
+            if response.status_code < 400:
+                self.aggregates_supported = True
+                return response.json() or []
+            if self.aggregates_supported is None and response.status_code == 400:
+                self.aggregates_supported = False  # db-aggregates-enabled is off
+            else:
+                response.raise_for_status()
+
+        docs: Dict[str, Dict] = {}
+        for row in self._fetch_rows(
+            {"select": "source_document,created_at", "course_id": f"eq.{subject_id}"}, 1000
+        ):
+            name = row.get("source_document") or "Unknown"
+            created_at = row.get("created_at")
+            doc = docs.setdefault(
+                name, {"source_document": name, "chunks": 0, "uploaded_at": created_at, "updated_at": created_at}
+            )
+            doc["chunks"] += 1
+            if created_at:
+                doc["uploaded_at"] = min(doc["uploaded_at"] or created_at, created_at)
+                doc["updated_at"] = max(doc["updated_at"] or created_at, created_at)
+        return list(docs.values())
+
+    def _fetch_rows(self, params: Dict, page_size: int) -> List[Dict]:
+        rows: List[Dict] = []
+        with self._client() as client:
+            while True:
+                response = client.get(
+                    f"{self.rest_url}/knowledge_base",
+                    headers=_headers(),
+                    params={
+                        **params,
+                        "order": "id.asc",
+                        "offset": str(len(rows)),
+                        "limit": str(page_size),
+                    },
+                    timeout=30.0,
+                )
+                response.raise_for_status()
+                page = response.json() or []
+                rows.extend(page)
+                if len(page) < page_size:
+                    return rows
+
+    def delete_chunks(self, ids: List, batch_size: int = 200) -> int:
+        """Delete rows by id, in batches that keep the URL short."""
+        deleted = 0
+        with self._client() as client:
+            for i in range(0, len(ids), batch_size):
+                part = ",".join(str(row_id) for row_id in ids[i:i + batch_size])
+                response = client.delete(
+                    f"{self.rest_url}/knowledge_base",
+                    headers={**_headers(), "Prefer": "return=minimal"},
+                    params={"id": f"in.({part})"},
+                    timeout=30.0,
+                )
+                response.raise_for_status()
+                deleted += len(ids[i:i + batch_size])
+        return deleted
+
+    def update_chunk(self, row_id, fields: Dict) -> None:
+        with self._client() as client:
+            response = client.patch(
+                f"{self.rest_url}/knowledge_base",
+                headers={**_headers(), "Prefer": "return=minimal"},
+                params={"id": f"eq.{row_id}"},
+                json=fields,
+                timeout=30.0,
+            )
+            response.raise_for_status()
+
+    # ─── Async API (request path — never blocks the event loop) ───
+
+    async def asimilarity_search(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         subject_id: str,
         top_k: int = 5,
         threshold: float = 0.7,
     ) -> List[Dict]:
-        """Search for similar chunks using the match_embeddings RPC function."""
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
+        """Search for similar chunks using the match_embeddings RPC function.
+
+        Served from the local index when the subject is loaded, else via the RPC.
+        """
+        if self.local_index is not None:
+            try:
+                local = self.local_index.search(subject_id, query_embedding, top_k, threshold)
+                if local is not None:
+                    return local
+            except Exception as e:
+                print(f"[VectorStore] local index search error: {e}")
+
+        async with self._aclient() as client:
+            response = await client.post(
                 f"{self.rest_url}/rpc/match_embeddings",
                 headers=_headers(),
-                json={
-                    "query_embedding": json.dumps(query_embedding),
-                    "filter_subject_id": subject_id,
-                    "match_threshold": threshold,
-                    "match_count": top_k,
-                },
+                json=self._similarity_payload(query_embedding, subject_id, top_k, threshold),
+                timeout=30.0,
             )
             response.raise_for_status()
             return response.json() or []
 
-    def keyword_search(
+    async def akeyword_search(
         self,
         query: str,
         subject_id: str,
         limit: int = 10,
     ) -> List[Dict]:
-        """Keyword search on knowledge_base content."""
-        with httpx.Client(timeout=30.0) as client:
-            params = {
-                "select": "id,course_id,title,content,chunk_index,source_document,metadata",
-                "course_id": f"eq.{subject_id}",
-                "content": f"ilike.*{query.replace(' ', '*')}*",
-                "limit": str(limit),
-            }
-            response = client.get(
+        """Keyword search on knowledge_base content.
+
+        Uses the subject's in-process BM25 index when loaded, else the ilike scan.
+        """
+        if self.local_index is not None:
+            try:
+                local = self.local_index.keyword_search(subject_id, query, limit)
+                if local is not None:
+                    return local
+            except Exception as e:
+                print(f"[VectorStore] local keyword search error: {e}")
+
+        async with self._aclient() as client:
+            response = await client.get(
                 f"{self.rest_url}/knowledge_base",
                 headers=_headers(),
-                params=params,
+                params=self._keyword_params(query, subject_id, limit),
+                timeout=30.0,
             )
             response.raise_for_status()
             return response.json() or []
 
-    def hybrid_search(
+    async def ahybrid_search(
         self,
         query: str,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         subject_id: str,
         top_k: int = 5,
         threshold: float = 0.7,
-    ) -> List[Dict]:
-        """Combine semantic + keyword search with re-ranking."""
-        semantic_results = self.similarity_search(
-            query_embedding, subject_id, top_k * 2, threshold
-        )
+        leg_timeout: Optional[float] = None,
+    ) -> Dict:
+        """Run semantic + keyword legs concurrently and merge what arrives in time.
+
+        Each leg gets ``leg_timeout`` seconds; a late or failing leg is dropped
+        and the other leg's results are still returned. Returns
+        ``{"results": [...], "legs": {"semantic": {...}, "keyword": {...}}}``.
+        """
+        leg_timeout = leg_timeout or RAG_SETTINGS["hybrid_leg_timeout_s"]
+        tasks = {
+            "semantic": asyncio.create_task(
+                self.asimilarity_search(query_embedding, subject_id, top_k * 2, threshold)
+            ),
+            "keyword": asyncio.create_task(
+                self.akeyword_search(query, subject_id, top_k * 2)
+            ),
+        }
+        _, pending = await asyncio.wait(tasks.values(), timeout=leg_timeout)
+        for task in pending:
+            task.cancel()
+
+        leg_results: Dict[str, List[Dict]] = {}
+        legs: Dict[str, Dict] = {}
+        errors = []
+        for name, task in tasks.items():
+            if task in pending:
+                leg_results[name] = []
+                legs[name] = {"status": "timeout", "count": 0}
+            elif task.exception() is not None:
+                errors.append(task.exception())
+                leg_results[name] = []
+                legs[name] = {"status": "error", "count": 0, "error": str(task.exception())}
+            else:
+                leg_results[name] = task.result()
+                legs[name] = {"status": "ok", "count": len(leg_results[name])}
 
-        keyword_results = self.keyword_search(query, subject_id, top_k * 2)
+        # Both legs failed outright — surface the error instead of an empty answer
+        if len(errors) == len(tasks):
+            raise errors[0]
 
-        return self._merge_results(semantic_results, keyword_results, top_k)
+        merged = self._merge_results(leg_results["semantic"], leg_results["keyword"], top_k)
+        for name, info in legs.items():
+            info["contributed"] = any(name in r.get("matched_by", []) for r in merged)
+
+        return {"results": merged, "legs": legs}
 
     @staticmethod
     def _merge_results(
         semantic: List[Dict], keyword: List[Dict], top_k: int
     ) -> List[Dict]:
-        """Merge and re-rank search results, prioritizing semantic matches."""
-        seen_ids = set()
-        merged = []
+        """Fuse both legs with reciprocal-rank fusion (RRF).
+
+        Ordering uses ``rrf_score`` = sum of 1 / (rrf_k + rank) over the legs a
+        chunk appears in. ``score`` stays a 0-1 relevance for the curriculum
+        boundary and confidence checks: cosine similarity for semantic hits,
+        and normalized BM25 capped at ``keyword_weight`` for keyword-only hits,
+        so keyword matches alone never admit an off-curriculum question.
+        Hits with the same ``content_hash`` (or linked via ``duplicate_of``)
+        keep only the best-ranked one.
+        """
+        rrf_k = RAG_SETTINGS["rrf_k"]
+        keyword_cap = RAG_SETTINGS["keyword_weight"]
+        top_keyword = max((r.get("keyword_score", 0) for r in keyword), default=0)
+        fused: Dict[str, Dict] = {}
 
-        for result in semantic:
+        for rank, result in enumerate(semantic, 1):
             rid = str(result.get("id", ""))
-            if rid and rid not in seen_ids:
-                result["score"] = result.get("similarity", 0) * 0.7
-                merged.append(result)
-                seen_ids.add(rid)
+            if rid and rid not in fused:
+                result["score"] = result.get("similarity", 0)
+                result["rrf_score"] = 1.0 / (rrf_k + rank)
+                result["matched_by"] = ["semantic"]
+                fused[rid] = result
 
-        for result in keyword:
+        for rank, result in enumerate(keyword, 1):
             rid = str(result.get("id", ""))
-            if rid and rid not in seen_ids:
-                result["score"] = 0.3
-                merged.append(result)
-                seen_ids.add(rid)
+            if not rid:
+                continue
+            if rid in fused:
+                hit = fused[rid]
+                if "keyword" not in hit["matched_by"]:
+                    hit["rrf_score"] += 1.0 / (rrf_k + rank)
+                    hit["matched_by"].append("keyword")
+                    if "keyword_score" in result:
+                        hit["keyword_score"] = result["keyword_score"]
+            else:
+                if top_keyword:
+                    relevance = result.get("keyword_score", 0) / top_keyword
+                else:
+                    relevance = 1.0 / rank  # ilike fallback: order only
+                result["score"] = round(keyword_cap * relevance, 4)
+                result["rrf_score"] = 1.0 / (rrf_k + rank)
+                result["matched_by"] = ["keyword"]
+                fused[rid] = result
+
+        merged = sorted(fused.values(), key=lambda x: x["rrf_score"], reverse=True)
 
-        merged.sort(key=lambda x: x.get("score", 0), reverse=True)
-        return merged[:top_k]
+        # Copies of one text (exact, or linked near-duplicates) share a single slot
+        seen_texts = set()
+        unique: List[Dict] = []
+        for hit in merged:
+            metadata = hit.get("metadata") or {}
+            text_key = (metadata.get("duplicate_of") or {}).get("content_hash") or metadata.get("content_hash")
+            if text_key:
+                if text_key in seen_texts:
+                    continue
+                seen_texts.add(text_key)
+            unique.append(hit)
+        return unique[:top_k]